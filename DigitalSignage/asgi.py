@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "DigitalSignage.settings")
+# Player polls wait on the event loop instead of in a thread
+os.environ.setdefault("PLAYER_ASYNC_VIEWS", "True")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up; serves player event streams (core/asgi.py)
+from core.asgi import with_player_events  # noqa: E402
+
+application = with_player_events(django_application)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import (
-    User, Notice, Contact, Device, Gallery, Photo, CitizenCharter, AuditLog
+    User, Notice, Contact, Device, Gallery, Photo, CitizenCharter, AuditLog, OutboxEvent, MediaJob, MediaBlob
 )
 
 # Register your models here.
@@ -53,3 +53,21 @@ class AuditLogAdmin(admin.ModelAdmin):
 class ContactAdmin(admin.ModelAdmin):
     list_display = ('full_name', 'phone_number', 'position')
     search_fields = ('full_name', 'phone_number', 'position')
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('event', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'event')
+    readonly_fields = ('event', 'dedupe_key', 'payload', 'attempts', 'last_error', 'created_at', 'sent_at')
+
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ('source', 'gallery', 'status', 'progress', 'attempts', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('gallery', 'source', 'progress', 'attempts', 'last_error', 'created_at', 'finished_at')
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'refcount', 'created_at', 'released_at')
+    list_filter = ('refcount',)
+    readonly_fields = ('name', 'size', 'refcount', 'created_at', 'released_at')
@@ -12,11 +12,13 @@ from django.urls import reverse_lazy
 from django.db.models import Count, Avg, Max, Sum, Subquery, OuterRef
 from django.http import HttpResponse
 import csv
+from datetime import datetime, time, timedelta
 from io import BytesIO
 from django.template.loader import get_template
 from xhtml2pdf import pisa
 
-from .models import Notice, Device, Gallery, CitizenCharter, User, Contact, ActionRequest, AuditLog, TickerMessage, Representative
+from .models import Notice, Device, Gallery, CitizenCharter, User, Contact, ActionRequest, AuditLog, TickerMessage, Representative, MediaJob
+from . import content_cache
 from .forms import (
     CustomUserCreationForm, CustomUserChangeForm, NoticeForm, SettingsForm, ContactForm, DeviceForm, TickerMessageForm
 )
@@ -76,11 +78,12 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        today = timezone.now().date()
-        
+        # Today in TIME_ZONE, as a range on the column so the (status, published_date) index serves it
+        start = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
         context['today_notices_count'] = Notice.objects.filter(
-            status='published', 
-            published_date__date=today
+            status='published',
+            published_date__gte=start,
+            published_date__lt=start + timedelta(days=1),
         ).count()
         
         context['active_devices_count'] = Device.objects.filter(is_active=True).count()
@@ -193,6 +196,14 @@ class GalleryListView(LoginRequiredMixin, ListView):
     template_name = "admin/gallery_list.html"
     context_object_name = "galleries"
 
+    def get_queryset(self):
+        # Status of the latest video processing job, for the progress column
+        latest_job = MediaJob.objects.filter(gallery=OuterRef('pk')).order_by('-created_at', '-pk')
+        return super().get_queryset().annotate(
+            media_status=Subquery(latest_job.values('status')[:1]),
+            media_progress=Subquery(latest_job.values('progress')[:1]),
+        )
+
 class GalleryCreateView(LoginRequiredMixin, CreateView):
     model = Gallery
     template_name = "admin/gallery_form.html"
@@ -350,6 +361,7 @@ class ActionRequestListView(LoginRequiredMixin, AdminRoleRequiredMixin, ListView
     model = ActionRequest
     template_name = "admin/action_request_list.html"
     context_object_name = "requests"
+    queryset = ActionRequest.objects.select_related('user')
 
 class ActionRequestCreateView(LoginRequiredMixin, CreateView):
     model = ActionRequest
@@ -433,7 +445,9 @@ class ReportView(LoginRequiredMixin, AdminRoleRequiredMixin, TemplateView):
         context['total_devices'] = Device.objects.count()
         
         # Recent Audit Logs
-        context['recent_logs'] = AuditLog.objects.all()[:50]
+        context['recent_logs'] = AuditLog.objects.select_related('user')[:50]
+
+        context['content_cache'] = content_cache.stats.snapshot()
         
         return context
 
@@ -0,0 +1,97 @@
+"""
+Player event streams for ASGI servers, answered before Django.
+
+Django runs each request in a context with a thread of its own, kept
+until the response is finished, and its built-in middleware uses that
+thread on every request. An event stream stays open for minutes, so
+served through Django each connected screen would hold a thread and a
+database connection. with_player_events() answers the stream URL itself,
+reading the database on a small shared thread pool (events.read()), and
+hands every other request to Django.
+
+The stream skips Django's middleware, so it checks the Host header against
+ALLOWED_HOSTS and adds the CORS and security headers itself, the way
+CorsMiddleware and SecurityMiddleware would on any other response.
+"""
+import asyncio
+import io
+import re
+
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.core.exceptions import DisallowedHost
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse
+from django.middleware.security import SecurityMiddleware
+
+from . import events
+from .models import Device
+
+# views.device_events in core/urls.py
+EVENTS_PATH = re.compile(r'^/api/v1/devices/(?P<device_id>[0-9]+)/events/$')
+
+
+def with_player_events(django_application):
+    """The ASGI application: event streams here, everything else to django_application."""
+    async def application(scope, receive, send):
+        match = EVENTS_PATH.match(scope['path']) if scope['type'] == 'http' else None
+        if match is None or scope['method'] != 'GET':
+            return await django_application(scope, receive, send)
+        await device_events(ASGIRequest(scope, io.BytesIO()), int(match['device_id']), receive, send)
+    return application
+
+
+async def device_events(request, device_id, receive, send):
+    """views.device_events as a bare ASGI response."""
+    try:
+        request.get_host()
+    except DisallowedHost:
+        return await empty_response(request, send, 400)
+    if not await events.read(Device.objects.filter(pk=device_id).exists):
+        return await empty_response(request, send, 404)
+    if not settings.PLAYER_EVENTS_ENABLED:
+        return await empty_response(request, send, 204)
+
+    response = HttpResponse(content_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers(request, response)})
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    stream = events.adevice_event_stream(device_id)
+    try:
+        while True:
+            # A closed connection ends the stream now, not at its next frame
+            frame = asyncio.ensure_future(anext(stream))
+            await asyncio.wait((frame, disconnected), return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                frame.cancel()
+                await asyncio.wait((frame,))
+                return
+            try:
+                body = frame.result()
+            except StopAsyncIteration:
+                break
+            await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        await stream.aclose()
+
+
+async def empty_response(request, send, status):
+    response = HttpResponse(status=status, headers={'Content-Length': '0'})
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers(request, response)})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def response_headers(request, response):
+    """response's headers, with what SecurityMiddleware and CorsMiddleware add, for http.response.start."""
+    SecurityMiddleware(lambda request: response).process_response(request, response)
+    CorsMiddleware(lambda request: response).add_response_headers(request, response)
+    return [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in response.items()]
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
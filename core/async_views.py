@@ -0,0 +1,128 @@
+"""
+Async versions of the read-only player endpoints, for ASGI servers.
+
+With PLAYER_ASYNC_VIEWS (on by default in DigitalSignage/asgi.py) these
+are routed ahead of the views they stand in for. They send the same
+bodies, ETags and content cache entries, read through Django's async ORM
+and wait on the event loop, so a screen between polls costs a socket
+rather than a worker thread. Everything other than the plain JSON GET a
+player sends (the browsable API, writes, later cursor pages) goes to the
+sync view, which Django runs in a thread. Event streams are answered
+before Django, by core/asgi.py.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import content_cache, snapshots, views
+from .models import Device, Notice, TickerMessage
+from .nepali_date_api import get_nepali_date, nepali_date_payload
+from .pagination import ContentCursorPagination
+from .playlist import published_notices
+from .serializers import NoticeSerializer, TickerMessageSerializer
+from .versioning import amodel_stamp
+
+
+def json_response(data):
+    """data as DRF's JSONRenderer sends it."""
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json')
+
+
+async def sync_view(view, request, *args, **kwargs):
+    return await sync_to_async(view)(request, *args, **kwargs)
+
+
+async def conditional_response(request, stamp, render, *variant):
+    """views.conditional_response() for an async render()."""
+    etag, last_modified = views.validators(request, stamp, *variant)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await render()
+    return views.set_validators(response, etag, last_modified)
+
+
+async def cached_response(request, stamp, render, *variant):
+    """
+    conditional_response() through the content cache, under the keys
+    ConditionalResponseMixin uses (variant starts with the format).
+    """
+    async def from_cache():
+        key = content_cache.key(stamp, request, *variant)
+        # Process memory or a local file: read without leaving the loop
+        response = content_cache.get(key, request)
+        if response is None:
+            response = await render()
+            if not response.has_header('X-Cache'):  # else a sync view cached it already
+                content_cache.store(key, response)
+        return response
+    return await conditional_response(request, stamp, from_cache, *variant)
+
+
+@csrf_exempt
+async def published(request):
+    """NoticeViewSet.published"""
+    if not views.wants_json(request):
+        return await sync_view(views.published_view, request)
+    fields = views.requested_fields(request)
+
+    async def render():
+        notices = [notice async for notice in published_notices()]
+        return json_response(NoticeSerializer(notices, many=True, fields=fields, context={'request': request}).data)
+    return await cached_response(request, await amodel_stamp(Notice), render, 'json', timezone.now().date())
+
+
+@csrf_exempt
+async def ticker_list(request):
+    """
+    TickerViewSet.list. Players ask for one page big enough for every
+    message; when there are more, the sync view builds the cursor links.
+    """
+    if not views.wants_json(request) or 'cursor' in request.GET:
+        return await sync_view(views.ticker_list_view, request)
+    page_size = ContentCursorPagination().get_page_size(Request(request))
+    fields = views.requested_fields(request)
+
+    async def render():
+        tickers = [ticker async for ticker in TickerMessage.objects.filter(is_active=True)
+                   .order_by('order', '-created_at', 'pk')[:page_size + 1]]
+        if len(tickers) > page_size:
+            response = await sync_view(views.ticker_list_view, request)
+            return await sync_to_async(response.render)()
+        results = TickerMessageSerializer(tickers, many=True, fields=fields, context={'request': request}).data
+        return json_response({'next': None, 'previous': None, 'results': results})
+    return await cached_response(request, await amodel_stamp(TickerMessage), render, 'json')
+
+
+@csrf_exempt
+async def device_playlist(request, device_id):
+    """views.device_playlist"""
+    if not views.wants_json(request):
+        return await sync_view(views.playlist_view, request, pk=device_id)
+    try:
+        snapshot = await snapshots.acurrent(device_id)
+    except Device.DoesNotExist:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    if snapshot is None:
+        return await sync_view(views.playlist_view, request, pk=device_id)
+    name, stamp = snapshot
+
+    async def render():
+        # A few KB from local disk
+        try:
+            return views.snapshot_response(request, name)
+        except FileNotFoundError:
+            # Another worker built a newer snapshot and removed this one since
+            return await sync_view(views.playlist_view, request, pk=device_id)
+    return await conditional_response(request, stamp, render, 'snapshot', timezone.now().date())
+
+
+@csrf_exempt
+async def nepali_date(request):
+    """get_nepali_date"""
+    if not views.wants_json(request):
+        return await sync_view(get_nepali_date, request)
+    return json_response(nepali_date_payload(request.GET.get('mode')))
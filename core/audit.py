@@ -0,0 +1,132 @@
+"""
+Buffered AuditLog writes.
+
+record() never inserts on the spot. An entry waits for its transaction
+to commit (entries of rolled back work are dropped) and is then collected
+by the innermost buffered() scope, which writes everything it collected
+with one bulk_create when it exits. AuditLogMiddleware opens a scope per
+request; wrap bulk edits in `with audit.buffered():` for the same effect.
+Outside any scope an entry is written as soon as its transaction commits.
+Under ASGI the middleware opens an abuffered() scope, which the sync views
+it awaits (run in worker threads) collect into.
+
+With AUDIT_LOG_ASYNC the batches are handed to a background writer thread
+instead of being written by the request thread.
+"""
+import atexit
+import queue
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from functools import partial
+
+from asgiref.local import Local
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import AuditLog
+
+_state = Local()  # per request, also across sync_to_async()
+
+
+def record(**fields):
+    fields.setdefault('timestamp', timezone.now())
+    transaction.on_commit(partial(_collect, AuditLog(**fields)))
+
+
+def _collect(entry):
+    buffer = getattr(_state, 'buffer', None)
+    if buffer is not None:
+        buffer.append(entry)
+    else:
+        write([entry])
+
+
+@contextmanager
+def buffered():
+    """Collect the entries committed inside the block and write them in one batch."""
+    if getattr(_state, 'buffer', None) is not None:
+        # Nested scope: the outer one flushes
+        yield
+        return
+
+    _state.buffer = []
+    try:
+        yield
+    finally:
+        entries, _state.buffer = _state.buffer, None
+        if entries:
+            write(entries)
+
+
+@asynccontextmanager
+async def abuffered():
+    """buffered() for async code."""
+    if getattr(_state, 'buffer', None) is not None:
+        yield
+        return
+
+    _state.buffer = []
+    try:
+        yield
+    finally:
+        entries, _state.buffer = _state.buffer, None
+        if entries:
+            await sync_to_async(write)(entries)
+
+
+def write(entries):
+    if settings.AUDIT_LOG_ASYNC:
+        _writer.submit(entries)
+    else:
+        AuditLog.objects.bulk_create(entries)
+
+
+class AsyncWriter:
+    """Single background thread that coalesces queued batches into bulk inserts."""
+
+    def __init__(self, max_batch=500):
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, entries):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+        self._queue.put(entries)
+
+    def flush(self):
+        """Block until everything submitted so far is written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batches = [self._queue.get()]
+            entries = list(batches[0])
+            while len(entries) < self.max_batch:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                entries.extend(batches[-1])
+            try:
+                AuditLog.objects.bulk_create(entries, batch_size=self.max_batch)
+            except Exception as e:
+                print(f"Failed to write {len(entries)} audit log entries: {e}")
+            finally:
+                close_old_connections()
+                for _ in batches:
+                    self._queue.task_done()
+
+
+_writer = AsyncWriter()
+atexit.register(_writer.flush)
+
+
+def flush():
+    """Wait for the async writer (no-op in synchronous mode)."""
+    _writer.flush()
@@ -0,0 +1,95 @@
+"""
+Negotiated gzip / Brotli compression of API JSON and pages.
+
+Brotli needs the `brotli` package; without it everything is gzip. Bodies
+that are kept anyway (content cache entries, playlist snapshots) are
+compressed once, at the highest levels, when stored. CompressionMiddleware
+compresses the rest per response at cheaper levels, and leaves responses
+that already carry a Content-Encoding alone.
+"""
+import gzip
+import re
+
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# In order of preference
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+MIN_SIZE = 200  # below this the headers cost more than compression saves
+TYPES = ('application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+QVALUE = re.compile(r';\s*q=([0-9.]+)')
+
+
+def negotiate(accept_encoding, available=ENCODINGS):
+    """The preferred encoding in available that the Accept-Encoding header allows, or None."""
+    accepted = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name = part.split(';')[0].strip()
+        match = QVALUE.search(part)
+        try:
+            accepted[name] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            continue
+    for encoding in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compressible(content_type, size):
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    return size >= MIN_SIZE and (media_type.startswith('text/') or media_type in TYPES)
+
+
+def compress(data, encoding, stored=False):
+    """data in encoding; stored trades time for size, for bodies compressed once."""
+    if encoding == 'br':
+        # Quality 10 and 11 take ~100x longer than 9 for a few percent on playlist JSON
+        return brotli.compress(data, quality=9 if stored else 5)
+    return gzip.compress(data, compresslevel=9 if stored else 6, mtime=0)
+
+
+def precompress(data, content_type):
+    """{encoding: body} for every available encoding, or {} when not worth compressing."""
+    if not compressible(content_type, len(data)):
+        return {}
+    return {encoding: compress(data, encoding, stored=True) for encoding in ENCODINGS}
+
+
+def encode(response, encoding, body):
+    """Put an encoded body on response, as GZipMiddleware does."""
+    response.content = body
+    response['Content-Length'] = str(len(body))
+    response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    # Not byte-for-byte the resource any more; weak ETags still match If-None-Match
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    return response
+
+
+def compress_response(request, response):
+    """Compress response for request in place, when it is worth it and the client accepts it."""
+    if response.streaming or response.has_header('Content-Encoding'):
+        return response  # event streams, media files, snapshots
+    if not compressible(response.get('Content-Type'), len(response.content)):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    html = response.get('Content-Type', '').startswith('text/html')
+    # Pages carry CSRF tokens: gzip with Django's random padding against BREACH
+    encoding = negotiate(request.headers.get('Accept-Encoding'), ('gzip',) if html else ENCODINGS)
+    if encoding is None:
+        return response
+    if html:
+        body = compress_string(response.content, max_random_bytes=100)
+    else:
+        body = compress(response.content, encoding)
+    if len(body) >= len(response.content):
+        return response
+    return encode(response, encoding, body)
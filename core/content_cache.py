@@ -0,0 +1,82 @@
+"""
+Rendered bytes of read-mostly API responses, kept in the default cache.
+
+Keys embed the ContentVersion stamp of the models behind a response. The
+receivers in signals.py bump those counters on every save and delete, so
+a change makes the old entries unreachable at once, in every worker. That
+also holds for the per-process local-memory backend, where deleting keys
+from a signal would only reach the process that handled the write.
+Unreachable entries age out after CONTENT_CACHE_TIMEOUT. Each entry also
+holds the body compressed in every available encoding, so a hit costs no
+compression either.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import compression
+
+KEY_PREFIX = 'content:v2:'  # entries are (content type, body, {encoding: body})
+
+
+class Stats:
+    """Hit/miss counters of this process."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = self.stores = 0
+
+    def record(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores,
+                    'hit_rate': round(self.hits / lookups * 100, 1) if lookups else None}
+
+
+stats = Stats()
+
+
+def key(stamp, request, *variant):
+    last_modified = stamp.last_modified.isoformat() if stamp.last_modified else ''
+    # The absolute URL: bodies carry absolute links built from the request host
+    raw = '|'.join([stamp.tag, last_modified, request.build_absolute_uri(), *map(str, variant)])
+    return KEY_PREFIX + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def get(key, request):
+    """The cached response for key, encoded as request accepts; None on a miss."""
+    entry = cache.get(key)
+    if entry is None:
+        stats.record('misses')
+        return None
+    stats.record('hits')
+    content_type, body, encoded = entry
+    response = HttpResponse(body, content_type=content_type)
+    encoding = compression.negotiate(request.headers.get('Accept-Encoding'), encoded)
+    if encoding:
+        compression.encode(response, encoding, encoded[encoding])
+    elif encoded:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def store(key, response):
+    """Keep a rendered 200 response under key."""
+    if response.status_code != 200:
+        return
+    encoded = compression.precompress(response.content, response['Content-Type'])
+    cache.set(key, (response['Content-Type'], response.content, encoded), settings.CONTENT_CACHE_TIMEOUT)
+    stats.record('stores')
+    response['X-Cache'] = 'MISS'
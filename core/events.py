@@ -0,0 +1,249 @@
+"""
+Change notifications for player screens (Server-Sent Events).
+
+versioning.bump_content() publishes to the broker below once the
+transaction commits. Streams in the same process wake immediately; the
+broker also touches a marker file so streams in other worker processes
+notice within MARKER_INTERVAL, and every stream re-reads its device
+counter at least every DB_POLL_INTERVAL as a safety net.
+
+adevice_event_stream() is the same stream for ASGI servers (core/asgi.py).
+It waits on the event loop, a single watcher task per loop checks the
+broker and the marker file for all streams, and its counter reads go to
+a shared thread pool, so an open stream holds no thread of its own.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import ContentVersion
+from . import versioning
+
+MARKER_INTERVAL = 0.25   # seconds between marker-file checks
+DB_POLL_INTERVAL = 15    # seconds between unconditional counter reads
+KEEPALIVE_INTERVAL = 15  # seconds of silence before a comment line is sent
+STREAM_LIFETIME = 300    # seconds before the client is asked to reconnect
+RETRY_MS = 3000
+
+# Topic names as used by the player, keyed by ContentVersion model key
+TOPICS = {
+    'core.notice': 'notices',
+    'core.gallery': 'galleries',
+    'core.photo': 'galleries',
+    'core.tickermessage': 'ticker',
+    'core.citizencharter': 'charters',
+    'core.representative': 'representatives',
+}
+
+Change = namedtuple('Change', ['sequence', 'topic', 'device_ids', 'emergency'])
+
+
+class ChangeBroker:
+    """Fan-out of committed content changes to the streams of this process."""
+
+    def __init__(self, history=256):
+        self._condition = threading.Condition()
+        self._changes = deque(maxlen=history)
+        self.sequence = 0
+
+    def publish(self, topic, device_ids=None, emergency=False):
+        with self._condition:
+            self.sequence += 1
+            self._changes.append(Change(self.sequence, topic, device_ids, emergency))
+            self._condition.notify_all()
+        touch_marker()
+
+    def wait(self, after, timeout):
+        """Block until a change newer than after or timeout; returns (sequence, changes)."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence > after, timeout)
+            return self.since(after)
+
+    def since(self, after):
+        """(sequence, changes newer than after), without waiting."""
+        with self._condition:
+            return self.sequence, [c for c in self._changes if c.sequence > after]
+
+
+broker = ChangeBroker()
+
+
+def touch_marker():
+    path = settings.PLAYER_EVENTS_MARKER
+    try:
+        with open(path, 'a'):
+            os.utime(path, None)
+    except OSError:
+        pass
+
+
+def marker_mtime():
+    try:
+        return os.stat(settings.PLAYER_EVENTS_MARKER).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class Watcher:
+    """
+    Wakes the async streams of one event loop. One task checks the broker
+    and the marker file every MARKER_INTERVAL while streams are waiting,
+    so an idle stream costs a timer instead of a check of its own.
+    """
+
+    def __init__(self, interval=MARKER_INTERVAL):
+        self.interval = interval
+        self._loop = self._changed = self._task = None
+        self._waiting = 0
+
+    async def wait(self, timeout):
+        """Wait up to timeout seconds for a change; True when one happened."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._changed, self._task = loop, asyncio.Event(), None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._watch())
+        changed = self._changed
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiting -= 1
+        return changed.is_set()
+
+    async def _watch(self):
+        sequence, marker = broker.sequence, marker_mtime()
+        while self._waiting:
+            await asyncio.sleep(self.interval)
+            if broker.sequence != sequence or marker_mtime() != marker:
+                sequence, marker = broker.sequence, marker_mtime()
+                # Wake everyone waiting; later waits get a fresh event
+                self._changed.set()
+                self._changed = asyncio.Event()
+
+
+watcher = Watcher()
+
+
+def topic_versions():
+    return dict(ContentVersion.objects.filter(key__in=TOPICS).values_list('key', 'version'))
+
+
+async def read(query, *args):
+    """
+    query(*args) on the shared thread pool, for async streams. The async
+    ORM would use the request's own thread, which a stream would then keep,
+    with its database connection, for as long as it is open.
+    """
+    return await sync_to_async(_read, thread_sensitive=False)(query, *args)
+
+
+def _read(query, *args):
+    close_old_connections()
+    try:
+        return query(*args)
+    finally:
+        close_old_connections()  # as at the end of a request
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def device_event_stream(device_id, lifetime=STREAM_LIFETIME, marker_interval=MARKER_INTERVAL,
+                        db_poll_interval=DB_POLL_INTERVAL, keepalive=KEEPALIVE_INTERVAL):
+    """Yield SSE frames announcing which topics changed for one device."""
+    sequence = broker.sequence
+    stamp = versioning.device_stamp(device_id).tag
+    versions = topic_versions()
+    marker = marker_mtime()
+    yield f"retry: {RETRY_MS}\n\n"
+
+    now = time.monotonic()
+    deadline, next_db_poll, last_write = now + lifetime, now + db_poll_interval, now
+
+    while time.monotonic() < deadline:
+        sequence, changes = broker.wait(sequence, marker_interval)
+        changes = [c for c in changes if c.device_ids is None or device_id in c.device_ids]
+
+        now = time.monotonic()
+        current_marker = marker_mtime()
+        if not changes and current_marker == marker and now < next_db_poll:
+            if now - last_write >= keepalive:
+                last_write = now
+                yield ": keepalive\n\n"
+            continue
+
+        marker, next_db_poll = current_marker, now + db_poll_interval
+        current_stamp = versioning.device_stamp(device_id).tag
+        if current_stamp == stamp:
+            continue
+
+        current_versions = topic_versions()
+        frame = change_event(changes, versions, current_versions, current_stamp)
+        stamp, versions = current_stamp, current_versions
+        last_write = now
+        yield frame
+
+
+async def adevice_event_stream(device_id, lifetime=STREAM_LIFETIME, db_poll_interval=DB_POLL_INTERVAL,
+                               keepalive=KEEPALIVE_INTERVAL):
+    """
+    device_event_stream() for async views. It sleeps until the watcher sees
+    a change or the next keepalive / counter read is due.
+    """
+    sequence = broker.sequence
+    stamp = (await read(versioning.device_stamp, device_id)).tag
+    versions = await read(topic_versions)
+    marker = marker_mtime()
+    yield f"retry: {RETRY_MS}\n\n"
+
+    now = time.monotonic()
+    deadline, next_db_poll, last_write = now + lifetime, now + db_poll_interval, now
+
+    while (now := time.monotonic()) < deadline:
+        await watcher.wait(max(min(next_db_poll, last_write + keepalive, deadline) - now, 0))
+        sequence, changes = broker.since(sequence)
+        changes = [c for c in changes if c.device_ids is None or device_id in c.device_ids]
+
+        now = time.monotonic()
+        current_marker = marker_mtime()
+        if not changes and current_marker == marker and now < next_db_poll:
+            if now - last_write >= keepalive:
+                last_write = now
+                yield ": keepalive\n\n"
+            continue
+
+        marker, next_db_poll = current_marker, now + db_poll_interval
+        current_stamp = (await read(versioning.device_stamp, device_id)).tag
+        if current_stamp == stamp:
+            continue
+
+        current_versions = await read(topic_versions)
+        frame = change_event(changes, versions, current_versions, current_stamp)
+        stamp, versions = current_stamp, current_versions
+        last_write = now
+        yield frame
+
+
+def change_event(changes, versions, current_versions, stamp):
+    """The change frame, from the topic counters at the last frame (versions) and now."""
+    # Topics published in this process are known; others are found by
+    # diffing the per-model counters.
+    topics = {c.topic for c in changes}
+    topics.update(TOPICS[key] for key, version in current_versions.items()
+                  if versions.get(key) != version)
+    return format_event('change', {
+        'topics': sorted(topics),
+        'emergency': any(c.emergency for c in changes),
+        'stamp': stamp,
+    })
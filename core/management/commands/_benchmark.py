@@ -0,0 +1,62 @@
+"""
+Helpers for benchmarks that measure in-process on seeded content (not a
+command: Django skips modules starting with an underscore).
+
+run_on_scratch_database() reruns a command with --worker in a process of
+its own, on a new SQLite database and snapshot directory, so the seeding
+never touches the configured database: no audit entries, and no
+ContentVersion bumps that would make every screen refetch.
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.models import CitizenCharter, Device, Notice, TickerMessage
+
+WORDS = ("नगरपालिकाको सूचना वडा कार्यालयमा नागरिकता जन्म दर्ता सामाजिक सुरक्षा भत्ता सम्बन्धी सेवा "
+         "आइतबारदेखि शुक्रबारसम्म उपलब्ध हुनेछ बैठक निर्णय बजेट कार्यक्रम स्वास्थ्य शिविर विद्यालय "
+         "सडक मर्मत खानेपानी आवेदन म्याद भित्र सम्पर्क गर्नुहुन अनुरोध छ").split()
+
+
+def run_on_scratch_database(command, arguments, stdout):
+    """Run `manage.py <command> --worker <arguments>` on a scratch database and copy its output to stdout."""
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'db.sqlite3')}",
+               'SNAPSHOT_DIR': os.path.join(directory, 'snapshots')}
+        # A shared file cache would mix the scratch content into the live one
+        env.pop('CACHE_DIR', None)
+        # A process of its own: the database is picked when settings load
+        worker = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), command, '--worker', *map(str, arguments)],
+            env=env, capture_output=True, text=True)
+    if worker.returncode:
+        raise CommandError(f"{command} failed:\n{worker.stderr}")
+    stdout.write(worker.stdout, ending='')
+
+
+def nepali(words, rng):
+    """Notice-like Devanagari text (shuffled, so it does not compress unrealistically well)."""
+    return ' '.join(rng.choice(WORDS) for _ in range(words)) + '।'
+
+
+def seed_content(rows, marker):
+    """Migrate, then seed a device with rows published notices, charters and ticker messages; the device."""
+    call_command('migrate', verbosity=0, interactive=False)
+    rng = random.Random(0)
+    device = Device.objects.create(name=marker, location_description=marker)
+    notices = Notice.objects.bulk_create(
+        Notice(title=f"{marker}-{i}", content=nepali(120, rng), status='published') for i in range(rows))
+    Notice.target_devices.through.objects.bulk_create(
+        Notice.target_devices.through(notice_id=n.pk, device_id=device.pk) for n in notices)
+    CitizenCharter.objects.bulk_create(
+        CitizenCharter(service_name=f"{marker}-{i}", required_docs=nepali(15, rng), service_time='१ दिन',
+                       service_fee='निःशुल्क', responsible_officer='वडा सचिव') for i in range(rows))
+    TickerMessage.objects.bulk_create(
+        TickerMessage(content=f"{marker}-{i} {nepali(12, rng)}", order=i) for i in range(rows))
+    return device
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Device, Notice, TickerMessage
+
+MARKER = "benchmark_asgi"
+
+
+class Command(BaseCommand):
+    help = ("Load-test player polling with many connected screens: gunicorn sync workers (WSGI) "
+            "against uvicorn with the async player views (ASGI)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--screens', default='100,1000,3000', help="Comma-separated numbers of screens to simulate")
+        parser.add_argument('--seconds', type=float, default=15, help="How long each run lasts")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds between a screen's polls")
+        parser.add_argument('--workers', type=int, default=1, help="Server processes, the same for both servers")
+        parser.add_argument('--timeout', type=float, default=10, help="Seconds before a request counts as failed")
+        parser.add_argument('--events', action='store_true',
+                            help="Every screen also holds its Server-Sent Events stream open")
+        parser.add_argument('--seed', type=int, help="Internal: create this many screens on DATABASE_URL")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.stdout.write(json.dumps(self.seed(options['seed'])))
+            return
+        counts = [int(n) for n in options['screens'].split(',')]
+        raise_open_files_limit()
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'db.sqlite3')}",
+                   'SNAPSHOT_DIR': os.path.join(directory, 'snapshots'), 'DEBUG': 'False',
+                   'PLAYER_EVENTS_ENABLED': str(options['events'])}
+            # A process of its own: the database is picked when settings load
+            seeded = subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_asgi', '--seed', str(max(counts))],
+                env=env, capture_output=True, text=True)
+            if seeded.returncode:
+                raise CommandError(f"Seeding failed:\n{seeded.stderr}")
+            device_ids = json.loads(seeded.stdout.strip().splitlines()[-1])
+
+            port = free_port()
+            servers = {
+                'wsgi': [sys.executable, '-m', 'gunicorn', 'DigitalSignage.wsgi:application',
+                         '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers'])],
+                'asgi': [sys.executable, '-m', 'uvicorn', 'DigitalSignage.asgi:application',
+                         '--host', '127.0.0.1', '--port', str(port), '--workers', str(options['workers']),
+                         '--lifespan', 'off', '--no-access-log', '--log-level', 'warning'],
+            }
+            self.stdout.write(f"{options['workers']} worker process(es), a poll every {options['interval']:g}s "
+                              f"per screen, {options['seconds']:g}s per run"
+                              f"{', event streams held open' if options['events'] else ''}\n")
+            self.stdout.write(f"{'server':<8}{'screens':>8}{'target/s':>10}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+                              f"{'errors':>8}{'streams':>9}")
+            for name, command in servers.items():
+                server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, preexec_fn=raise_open_files_limit,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    wait_for_port(port)
+                    for screens in counts:
+                        row = asyncio.run(self.load(port, device_ids[:screens], options))
+                        self.stdout.write(
+                            f"{name:<8}{screens:>8}{screens / options['interval']:>10.0f}"
+                            f"{row['ok'] / options['seconds']:>8.0f}{row['p50']:>9.1f}{row['p99']:>9.1f}"
+                            f"{row['errors']:>8}{row['streams']:>9}")
+                finally:
+                    server.terminate()
+                    server.wait()
+
+    def seed(self, screens):
+        call_command('migrate', verbosity=0, interactive=False)
+        devices = Device.objects.bulk_create(
+            Device(name=f"{MARKER}-{i}", location_description=MARKER) for i in range(screens))
+        # Five notices per screen
+        notices = Notice.objects.bulk_create(
+            Notice(title=f"{MARKER}-{i}", content=MARKER * 20, status='published') for i in range(5 * screens))
+        Notice.target_devices.through.objects.bulk_create(
+            Notice.target_devices.through(notice_id=n.pk, device_id=devices[i % screens].pk)
+            for i, n in enumerate(notices))
+        for i in range(10):
+            TickerMessage.objects.create(content=f"{MARKER}-{i}", order=i)
+        # Measure steady polling, not every screen's first snapshot build
+        call_command('rebuild_snapshots', stdout=StringIO())
+        return [device.pk for device in devices]
+
+    async def load(self, port, device_ids, options):
+        deadline = time.monotonic() + options['seconds']
+        timings, result = [], {'errors': 0, 'streams': 0}
+
+        async def screen(device_id):
+            # Players poll their playlist and the ticker, revalidating with If-None-Match
+            urls = [f'/api/v1/devices/{device_id}/playlist/', '/api/v1/ticker/?page_size=500']
+            etags, connection = {}, None
+            await asyncio.sleep(random.uniform(0, options['interval']))  # screens start at different times
+            polls = 0
+            while time.monotonic() < deadline:
+                url, polls = urls[polls % 2], polls + 1
+                started = time.monotonic()
+                try:
+                    connection, (status, headers) = await asyncio.wait_for(
+                        get(connection, port, url, etags.get(url)), options['timeout'])
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    result['errors'] += 1
+                    connection = close(connection)
+                else:
+                    if status in (200, 304):
+                        timings.append((time.monotonic() - started) * 1000)
+                        etags[url] = headers.get('etag', etags.get(url))
+                    else:
+                        result['errors'] += 1
+                    if headers.get('connection') == 'close':
+                        connection = close(connection)
+                await asyncio.sleep(options['interval'])
+            close(connection)
+
+        async def stream(device_id):
+            await asyncio.sleep(random.uniform(0, options['interval']))  # as players come online
+            try:
+                connection = await asyncio.open_connection('127.0.0.1', port)
+                reader, writer = connection
+                writer.write(f'GET /api/v1/devices/{device_id}/events/ HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+                status = await asyncio.wait_for(reader.readline(), options['timeout'])
+            except (OSError, asyncio.TimeoutError):
+                result['errors'] += 1
+                return
+            if b' 200 ' in status:
+                result['streams'] += 1
+            while time.monotonic() < deadline:
+                try:
+                    await asyncio.wait_for(reader.read(4096), max(deadline - time.monotonic(), 0.01))
+                except asyncio.TimeoutError:
+                    break
+            close(connection)
+
+        tasks = [screen(pk) for pk in device_ids]
+        if options['events']:
+            tasks += [stream(pk) for pk in device_ids]
+        await asyncio.gather(*tasks)
+        cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99 or [0] * 99
+        return {'ok': len(timings), 'p50': cuts[49], 'p99': cuts[98], **result}
+
+
+async def get(connection, port, url, etag):
+    """
+    (connection, request()) on the kept-alive connection, or a new one. When
+    the server has closed an idle connection the GET is retried, as browsers do.
+    """
+    if connection is not None:
+        try:
+            return connection, await request(connection, url, etag)
+        except (OSError, asyncio.IncompleteReadError):
+            close(connection)
+    connection = await asyncio.open_connection('127.0.0.1', port)
+    return connection, await request(connection, url, etag)
+
+
+async def request(connection, url, etag):
+    """One keep-alive GET; (status, lower-cased headers). The body is read and dropped."""
+    reader, writer = connection
+    conditional = f'If-None-Match: {etag}\r\n' if etag else ''
+    writer.write(f'GET {url} HTTP/1.1\r\nHost: localhost\r\nAccept-Encoding: gzip\r\n{conditional}\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readuntil(b'\r\n')).split()[1])
+    headers = {}
+    for line in (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n'):
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif status not in (204, 304):
+        await reader.read()  # no length: the body ends with the connection
+        headers['connection'] = 'close'
+    return status, headers
+
+
+def close(connection):
+    if connection is not None:
+        connection[1].close()
+    return None
+
+
+def raise_open_files_limit():
+    """Thousands of screens need thousands of sockets, in the client and the server."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"The server did not start listening on port {port}")
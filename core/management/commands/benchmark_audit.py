@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core import audit
+from core.models import AuditLog
+
+MARKER = "benchmark_audit"
+
+
+class Command(BaseCommand):
+    help = "Compare per-row AuditLog inserts with the buffered and async audit writers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Entries written per mode")
+        parser.add_argument('--requests', type=int, default=20,
+                            help="Buffered modes: number of request-sized scopes the rows are split into")
+
+    def handle(self, *args, **options):
+        rows, scopes = options['rows'], options['requests']
+        per_scope = max(rows // scopes, 1)
+
+        def per_row():
+            for i in range(rows):
+                AuditLog.objects.create(action="Updated", model_name=MARKER, object_id=str(i), details=MARKER)
+
+        def buffered():
+            for start in range(0, rows, per_scope):
+                with audit.buffered():
+                    for i in range(start, min(start + per_scope, rows)):
+                        audit.record(action="Updated", model_name=MARKER, object_id=str(i), details=MARKER)
+
+        def buffered_async():
+            with override_settings(AUDIT_LOG_ASYNC=True):
+                buffered()
+                submitted = time.perf_counter()
+                audit.flush()
+            return submitted
+
+        self.stdout.write(f"{rows} audit entries per mode, {per_scope} per buffered scope\n")
+        self.stdout.write(f"{'mode':<16}{'seconds':>10}{'rows/s':>12}{'request path s':>16}")
+        try:
+            for name, run in (('per-row', per_row), ('buffered', buffered), ('buffered+async', buffered_async)):
+                started = time.perf_counter()
+                submitted = run()
+                elapsed = time.perf_counter() - started
+                written = AuditLog.objects.filter(model_name=MARKER).count()
+                if written != rows:
+                    self.stderr.write(f"{name}: expected {rows} rows, found {written}")
+                # Time spent on the caller's thread (the async mode finishes writing in the background)
+                request_path = submitted - started if submitted else elapsed
+                self.stdout.write(f"{name:<16}{elapsed:>10.3f}{rows / elapsed:>12.0f}{request_path:>16.3f}")
+                AuditLog.objects.filter(model_name=MARKER).delete()
+        finally:
+            AuditLog.objects.filter(model_name=MARKER).delete()
@@ -0,0 +1,69 @@
+import gzip
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import compression
+
+from ._benchmark import run_on_scratch_database, seed_content
+
+MARKER = "benchmark_compression"
+
+
+class Command(BaseCommand):
+    help = ("Report compressed sizes and compression cost of typical player and API payloads "
+            "(on a scratch database)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50, help="Notices, charters and ticker messages to seed")
+        parser.add_argument('--iterations', type=int, default=20, help="Compressions timed per setting")
+        parser.add_argument('--mbps', type=float, default=10, help="Link speed for the transfer estimate")
+        parser.add_argument('--worker', action='store_true', help="Internal: seed and measure on DATABASE_URL")
+
+    def handle(self, *args, **options):
+        rows, iterations, mbps = options['rows'], options['iterations'], options['mbps']
+        if not options['worker']:
+            return run_on_scratch_database(
+                'benchmark_compression', ['--rows', rows, '--iterations', iterations, '--mbps', mbps], self.stdout)
+        device = seed_content(rows, MARKER)
+        directory = tempfile.mkdtemp()
+        payloads = (
+            ('playlist', reverse('device_playlist', args=[device.pk])),
+            ('published notices', reverse('notice-published')),
+            ('charters', reverse('citizencharter-list')),
+            ('player page', reverse('player_display', args=[device.pk])),
+        )
+
+        def timed(function, data):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                result = function(data)
+            return result, (time.perf_counter() - started) * 1000 / iterations
+
+        decompress = {'gzip': gzip.decompress, 'br': getattr(compression.brotli, 'decompress', None)}
+        self.stdout.write(f"{rows} rows per table, {iterations} runs per setting, transfer at {mbps:g} Mbit/s\n")
+        self.stdout.write(f"{'payload':<20}{'encoding':<18}{'KB':>8}{'ratio':>8}{'compress ms':>13}"
+                          f"{'inflate ms':>12}{'total ms':>10}")
+        try:
+            with override_settings(SNAPSHOT_DIR=directory, ALLOWED_HOSTS=['testserver']):
+                client = Client()
+                for name, url in payloads:
+                    body = client.get(url).content  # no Accept-Encoding: the identity body
+                    transfer = len(body) * 8 / (mbps * 1000)
+                    self.stdout.write(f"{name:<20}{'identity':<18}{len(body) / 1024:>8.1f}{'100%':>8}"
+                                      f"{'-':>13}{'-':>12}{transfer:>10.1f}")
+                    for encoding in compression.ENCODINGS:
+                        for label, stored in (('per response', False), ('stored', True)):
+                            encoded, compress_ms = timed(lambda d: compression.compress(d, encoding, stored), body)
+                            _, inflate_ms = timed(decompress[encoding], encoded)
+                            # Stored bodies are compressed once per change, not per request
+                            total = (0 if stored else compress_ms) + len(encoded) * 8 / (mbps * 1000) + inflate_ms
+                            self.stdout.write(f"{'':<20}{f'{encoding} {label}':<18}{len(encoded) / 1024:>8.1f}"
+                                              f"{len(encoded) / len(body):>8.0%}{compress_ms:>13.2f}"
+                                              f"{inflate_ms:>12.2f}{total:>10.1f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,122 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from core.models import AuditLog, Device, Notice, User
+from core.playlist import published_notices
+
+MARKER = "benchmark_databases"
+
+
+class Command(BaseCommand):
+    help = "Compare SQLite and PostgreSQL under concurrent player reads, heartbeats, audit inserts and admin saves"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--postgres', help="URL of a scratch PostgreSQL database (it is migrated and written to)")
+        parser.add_argument('--writers', type=int, default=16, help="Concurrent threads, each mixing reads and writes")
+        parser.add_argument('--seconds', type=float, default=10, help="How long each backend runs")
+        parser.add_argument('--worker', action='store_true', help="Internal: run the workload on DATABASE_URL")
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.workload(options['writers'], options['seconds'])))
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            backends = [
+                ('sqlite', f"sqlite:///{os.path.join(directory, 'untuned.sqlite3')}", {'SQLITE_SINGLE_NODE': 'False'}),
+                ('sqlite wal', f"sqlite:///{os.path.join(directory, 'single-node.sqlite3')}", {}),
+            ]
+            if options['postgres']:
+                backends.append(('postgresql', options['postgres'], {}))
+            self.stdout.write(f"{options['writers']} threads, {options['seconds']:g}s per backend\n")
+            self.stdout.write(f"{'backend':<12}{'operation':<14}{'ops':>8}{'ops/s':>9}{'p50 ms':>9}"
+                              f"{'p99 ms':>9}{'max ms':>9}{'errors':>8}")
+            for backend, url, env in backends:
+                # A process per backend: the database is picked when settings load
+                worker = subprocess.run(
+                    [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_databases', '--worker',
+                     '--writers', str(options['writers']), '--seconds', str(options['seconds'])],
+                    env={**os.environ, **env, 'DATABASE_URL': url}, capture_output=True, text=True)
+                if worker.returncode:
+                    raise CommandError(f"{backend} run failed:\n{worker.stderr}")
+                for name, row in json.loads(worker.stdout.strip().splitlines()[-1]).items():
+                    self.stdout.write(f"{backend:<12}{name:<14}{row['ops']:>8}{row['ops'] / options['seconds']:>9.0f}"
+                                      f"{row['p50']:>9.1f}{row['p99']:>9.1f}{row['max']:>9.1f}{row['errors']:>8}")
+        if not options['postgres']:
+            self.stdout.write("\nPass --postgres postgres://... (a scratch database) to compare with PostgreSQL")
+
+    def workload(self, writers, seconds):
+        call_command('migrate', verbosity=0, interactive=False)
+        user = User.objects.create(username=f"{MARKER}-{time.time_ns()}")
+        device_ids = [d.pk for d in Device.objects.bulk_create(
+            Device(name=f"{MARKER}-{i}", location_description=MARKER) for i in range(50))]
+        close_old_connections()
+
+        def player_read(rng):
+            list(published_notices(rng.choice(device_ids)))
+
+        def heartbeat(rng):
+            Device.objects.filter(pk=rng.choice(device_ids)).update(last_seen=timezone.now(), telemetry={'uptime': 1})
+
+        def audit_insert(rng):
+            AuditLog.objects.create(user=user, action='Updated', model_name='Notice', object_id=str(rng.random()))
+
+        def admin_save(rng):
+            # What a dashboard save does: the row, its version bumps and audit entry, in one transaction
+            with transaction.atomic():
+                notice = Notice.objects.create(title=MARKER, content='...', status='draft', created_by=user)
+                notice.target_devices.add(rng.choice(device_ids))
+
+        operations = {'player read': player_read, 'heartbeat': heartbeat,
+                      'audit insert': audit_insert, 'admin save': admin_save}
+        timings = {name: [] for name in operations}
+        errors = {name: 0 for name in operations}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def writer(seed):
+            rng = random.Random(seed)
+            names = list(operations)
+            while time.perf_counter() < deadline:
+                name = rng.choice(names)
+                started = time.perf_counter()
+                try:
+                    operations[name](rng)
+                except OperationalError:  # "database is locked"
+                    with lock:
+                        errors[name] += 1
+                else:
+                    with lock:
+                        timings[name].append((time.perf_counter() - started) * 1000)
+                finally:
+                    close_old_connections()  # as at the end of a request
+            connection.close()
+
+        threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        Notice.objects.filter(title=MARKER).delete()
+        Device.objects.filter(pk__in=device_ids).delete()
+        AuditLog.objects.filter(user=user).delete()
+        user.delete()
+        result = {}
+        for name, samples in timings.items():
+            cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99 or [0] * 99
+            result[name] = {'ops': len(samples), 'p50': cuts[49], 'p99': cuts[98],
+                            'max': max(samples, default=0), 'errors': errors[name]}
+        return result
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_asgi import close, free_port, get, raise_open_files_limit, wait_for_port
+
+
+class Command(BaseCommand):
+    help = ("Measure requests per second of gunicorn with gunicorn.conf.py at different worker and thread "
+            "counts, under a closed loop of player requests")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1x1,2x1,2x4,auto',
+                            help="Comma-separated WORKERSxTHREADS to run, or 'auto' for gunicorn.conf.py's sizing")
+        parser.add_argument('--clients', type=int, default=32, help="Concurrent connections sending requests")
+        parser.add_argument('--seconds', type=float, default=10, help="How long each size is measured")
+        parser.add_argument('--screens', type=int, default=100, help="Screens to seed and poll the playlists of")
+
+    def handle(self, *args, **options):
+        runs = []
+        for spec in options['sizes'].split(','):
+            if spec == 'auto':
+                runs.append((spec, {}))
+                continue
+            try:
+                workers, threads = (int(n) for n in spec.split('x'))
+            except ValueError:
+                raise CommandError(f"Expected WORKERSxTHREADS or 'auto', not {spec!r}")
+            runs.append((spec, {'GUNICORN_WORKERS': str(workers), 'GUNICORN_THREADS': str(threads)}))
+
+        raise_open_files_limit()
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'db.sqlite3')}",
+                   'SNAPSHOT_DIR': os.path.join(directory, 'snapshots'), 'DEBUG': 'False'}
+            # benchmark_asgi's seeding, in a process of its own: the database is picked when settings load
+            seeded = subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_asgi', '--seed',
+                 str(options['screens'])], env=env, capture_output=True, text=True)
+            if seeded.returncode:
+                raise CommandError(f"Seeding failed:\n{seeded.stderr}")
+            device_ids = json.loads(seeded.stdout.strip().splitlines()[-1])
+
+            self.stdout.write(f"{options['clients']} clients, {options['seconds']:g}s per size\n")
+            self.stdout.write(f"{'size':<10}{'workers':>8}{'threads':>8}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+                              f"{'errors':>8}")
+            for spec, overrides in runs:
+                port = free_port()
+                run_env = {**env, **overrides}
+                command = [sys.executable, '-m', 'gunicorn', 'DigitalSignage.wsgi:application',
+                           '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}']
+                printed = subprocess.run(command + ['--print-config'], cwd=settings.BASE_DIR, env=run_env,
+                                         capture_output=True, text=True).stdout
+                sizing = read_sizing(printed)
+                server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=run_env,
+                                          preexec_fn=raise_open_files_limit,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    wait_for_port(port)
+                    asyncio.run(self.load(port, device_ids, options['clients'], 2))  # workers booted, caches warm
+                    row = asyncio.run(self.load(port, device_ids, options['clients'], options['seconds']))
+                finally:
+                    server.terminate()
+                    server.wait()
+                self.stdout.write(f"{spec:<10}{sizing['workers']:>8}{sizing['threads']:>8}"
+                                  f"{row['ok'] / options['seconds']:>8.0f}{row['p50']:>9.1f}{row['p99']:>9.1f}"
+                                  f"{row['errors']:>8}")
+
+    async def load(self, port, device_ids, clients, seconds):
+        deadline = time.monotonic() + seconds
+        timings, result = [], {'errors': 0}
+        # What a screen fetches, without If-None-Match so every request renders or reads a body
+        urls = ['/api/v1/devices/{}/playlist/', '/api/v1/ticker/?page_size=500',
+                '/api/v1/notices/published/', '/api/v1/nepali-date/']
+
+        async def client():
+            connection = None
+            while time.monotonic() < deadline:
+                url = random.choice(urls).format(random.choice(device_ids))
+                started = time.monotonic()
+                try:
+                    connection, (status, headers) = await asyncio.wait_for(get(connection, port, url, None), 10)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    result['errors'] += 1
+                    connection = close(connection)
+                    continue
+                if status == 200:
+                    timings.append((time.monotonic() - started) * 1000)
+                else:
+                    result['errors'] += 1
+                if headers.get('connection') == 'close':
+                    connection = close(connection)
+            close(connection)
+
+        await asyncio.gather(*(client() for _ in range(clients)))
+        cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99 or [0] * 99
+        return {'ok': len(timings), 'p50': cuts[49], 'p99': cuts[98], **result}
+
+
+def read_sizing(printed):
+    """workers and threads from gunicorn --print-config."""
+    values = dict((part.strip() for part in line.split('=', 1)) for line in printed.splitlines() if '=' in line)
+    return {name: values.get(name, '?') for name in ('workers', 'threads')}
@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import audit
+from core.models import AuditLog, Device, User
+
+MARKER = "benchmark_heartbeat"
+
+
+class Command(BaseCommand):
+    help = "Compare the old save()-based heartbeat with the single-UPDATE and bulk heartbeats"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000, help="Heartbeats per mode")
+        parser.add_argument('--devices', type=int, default=50,
+                            help="Screens behind one gateway (beats per bulk request)")
+
+    def handle(self, *args, **options):
+        iterations, site_size = options['iterations'], options['devices']
+        started_at = timezone.now()
+        devices = Device.objects.bulk_create(
+            Device(name=f"{MARKER}-{i}", location_description=MARKER) for i in range(site_size))
+        device_ids = [d.pk for d in devices]
+        user = User.objects.create(username=MARKER)
+        client = APIClient()
+        client.force_authenticate(user)
+        telemetry = {'uptime': 3600, 'current_item': 'gallery:1', 'fps': 59.9}
+        rounds = max(iterations // site_size, 1)
+        beats = rounds * site_size
+
+        def legacy():
+            # What DeviceViewSet.heartbeat used to do: load, save every column, audit
+            for _ in range(rounds):
+                for pk in device_ids:
+                    with audit.buffered():
+                        d = Device.objects.get(pk=pk)
+                        d.last_seen = timezone.now()
+                        d.save()
+            return beats
+
+        def update():
+            for _ in range(rounds):
+                for pk in device_ids:
+                    Device.objects.filter(pk=pk).update(last_seen=timezone.now(), telemetry=telemetry)
+            return beats
+
+        def endpoint():
+            for _ in range(rounds):
+                for pk in device_ids:
+                    client.post(reverse('device-heartbeat', args=[pk]), telemetry, format='json')
+            return beats
+
+        def bulk():
+            body = {'devices': [dict(telemetry, id=pk) for pk in device_ids]}
+            for _ in range(rounds):
+                client.post(reverse('device-heartbeats'), body, format='json')
+            return rounds
+
+        self.stdout.write(f"{beats} heartbeats per mode from {site_size} devices\n")
+        self.stdout.write(f"{'mode':<24}{'per beat ms':>12}{'beats/s':>10}{'requests':>10}{'audit rows':>12}")
+        try:
+            for name, run in (('legacy get+save', legacy), ('single UPDATE', update),
+                              ('endpoint (per device)', endpoint), ('bulk endpoint', bulk)):
+                audit_before = AuditLog.objects.count()
+                started = time.perf_counter()
+                requests = run()
+                elapsed = time.perf_counter() - started
+                audit_rows = AuditLog.objects.count() - audit_before
+                self.stdout.write(f"{name:<24}{elapsed * 1000 / beats:>12.3f}{beats / elapsed:>10.0f}"
+                                  f"{requests if run in (endpoint, bulk) else '-':>10}{audit_rows:>12}")
+        finally:
+            Device.objects.filter(pk__in=device_ids).delete()
+            # Drop the audit rows of this run's devices and user (all named after MARKER),
+            # leaving those that workers write meanwhile
+            AuditLog.objects.filter(Q(details__contains=MARKER) | Q(user=user), timestamp__gte=started_at).delete()
+            user.delete()
@@ -0,0 +1,68 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.utils.http import http_date
+from django.views.static import serve
+
+from core.media_views import serve_media
+from core.storage import blob_name
+
+
+class Command(BaseCommand):
+    help = "Compare django.views.static.serve with core.media_views.serve_media for what players request"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50, help="Size of the test video in MB")
+        parser.add_argument('--iterations', type=int, default=20, help="Requests per scenario")
+
+    def handle(self, *args, **options):
+        root = tempfile.mkdtemp()
+        data = os.urandom(options['size'] * 1024 * 1024)
+        name = blob_name(hashlib.sha256(data).hexdigest(), 'clip.mp4')
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(data)
+        size, factory = len(data), RequestFactory()
+        # A seek near the end, as a <video> does when a loop restarts mid-file
+        seek = f'bytes={size * 9 // 10}-'
+
+        def static_view(request):
+            return serve(request, name, document_root=root)
+
+        def media_view(request):
+            return serve_media(request, name)
+
+        scenarios = (
+            ('full download', {}),
+            ('seek (Range)', {'HTTP_RANGE': seek}),
+            ('revalidate (IMS)', {'HTTP_IF_MODIFIED_SINCE': http_date(os.stat(path).st_mtime)}),
+        )
+        self.stdout.write(f"{options['size']} MB file, {options['iterations']} requests per scenario\n")
+        self.stdout.write(f"{'scenario':<20}{'view':<14}{'status':>8}{'ms/req':>10}{'MB sent':>10}")
+        try:
+            with override_settings(MEDIA_ROOT=root, MEDIA_ACCEL_REDIRECT=''):
+                for scenario, headers in scenarios:
+                    for label, view in (('static.serve', static_view), ('serve_media', media_view)):
+                        sent, started = 0, time.perf_counter()
+                        for _ in range(options['iterations']):
+                            response = view(factory.get('/media/' + name, **headers))
+                            if response.streaming:
+                                sent += sum(len(chunk) for chunk in response.streaming_content)
+                            else:
+                                sent += len(response.content)
+                            response.close()
+                        elapsed = (time.perf_counter() - started) * 1000 / options['iterations']
+                        self.stdout.write(f"{scenario:<20}{label:<14}{response.status_code:>8}{elapsed:>10.2f}"
+                                          f"{sent / options['iterations'] / 1024 / 1024:>10.2f}")
+                response = media_view(factory.get('/media/' + name))
+                response.close()
+                self.stdout.write(f"\nserve_media Cache-Control: {response['Cache-Control']} "
+                                  "(screens skip the request entirely until it expires)")
+        finally:
+            shutil.rmtree(root)
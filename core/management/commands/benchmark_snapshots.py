@@ -0,0 +1,61 @@
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from core.views import device_playlist, playlist_view
+
+from ._benchmark import run_on_scratch_database, seed_content
+
+MARKER = "benchmark_snapshots"
+
+
+class Command(BaseCommand):
+    help = ("Compare player playlist polls served by DeviceViewSet.playlist with pre-rendered snapshots "
+            "(on a scratch database)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help="Requests per mode")
+        parser.add_argument('--rows', type=int, default=100, help="Notices, charters and ticker messages to seed")
+        parser.add_argument('--worker', action='store_true', help="Internal: seed and measure on DATABASE_URL")
+
+    def handle(self, *args, **options):
+        iterations, rows = options['iterations'], options['rows']
+        if not options['worker']:
+            return run_on_scratch_database(
+                'benchmark_snapshots', ['--iterations', iterations, '--rows', rows], self.stdout)
+        device = seed_content(rows, MARKER)
+        directory = tempfile.mkdtemp()
+        factory = RequestFactory()
+        url = reverse('device_playlist', args=[device.pk])
+
+        def live():
+            return playlist_view(factory.get(url), pk=device.pk).render()
+
+        def cold():
+            shutil.rmtree(directory, ignore_errors=True)  # every poll renders and writes the file
+            return device_playlist(factory.get(url), device.pk)
+
+        def warm():
+            return device_playlist(factory.get(url), device.pk)
+
+        def warm_gzip():
+            return device_playlist(factory.get(url, HTTP_ACCEPT_ENCODING='gzip'), device.pk)
+
+        self.stdout.write(f"{iterations} polls per mode, {rows} notices/charters/ticker messages\n")
+        self.stdout.write(f"{'mode':<24}{'ms/req':>10}{'req/s':>10}{'KB sent':>10}")
+        try:
+            with override_settings(SNAPSHOT_DIR=directory):
+                for name, run in (('viewset (live)', live), ('snapshot, cold', cold),
+                                  ('snapshot', warm), ('snapshot, gzip', warm_gzip)):
+                    started = time.perf_counter()
+                    for _ in range(iterations):
+                        response = run()
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f"{name:<24}{elapsed * 1000 / iterations:>10.2f}{iterations / elapsed:>10.0f}"
+                                      f"{len(response.content) / 1024:>10.1f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,40 @@
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued webhooks (n8n) from the outbox, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain what is due now and exit")
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help="Seconds to sleep when nothing is due (default: 2)")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--timeout', type=float, default=5.0, help="HTTP timeout per request")
+
+    def handle(self, *args, **options):
+        url = settings.N8N_WEBHOOK_URL
+        if not url:
+            # Nothing is queued without a webhook (outbox.enqueue), so there is nothing to do
+            self.stdout.write("N8N_WEBHOOK_URL is not configured; no webhooks to deliver")
+            return
+
+        session = requests.Session()
+        try:
+            while True:
+                sent, failed = outbox.dispatch_batch(url, options['batch_size'], options['timeout'], session)
+                if sent or failed:
+                    self.stdout.write(f"Delivered {sent}, failed {failed}")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            session.close()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import renditions
+
+
+class Command(BaseCommand):
+    help = "Build the resized image variants for uploads that do not have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild every record, not only stale ones")
+
+    def handle(self, *args, **options):
+        for model, (file_field, _) in renditions.FIELDS.items():
+            built = 0
+            for instance in model.objects.exclude(**{file_field: ''}).exclude(**{f'{file_field}__isnull': True}).iterator():
+                try:
+                    built += renditions.refresh(instance, force=options['force'])
+                except FileNotFoundError:
+                    self.stderr.write(f"{model.__name__} {instance.pk}: {getattr(instance, file_field).name} is missing")
+            self.stdout.write(f"{model.__name__}: {built} rebuilt")
@@ -0,0 +1,108 @@
+import os
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+SOURCE = 'sqlite_import'
+
+
+@contextmanager
+def sqlite_connection(path, alias=SOURCE):
+    """An extra database alias for the SQLite file at path, removed on exit."""
+    connections.databases[alias] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    connections.configure_settings(connections.databases)  # fills in the defaults
+    try:
+        yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Copy auto_now / auto_now_add values as they are instead of stamping them now."""
+    fields = [f for f in model._meta.concrete_fields if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Copy every row of an SQLite database (e.g. the old db.sqlite3) into the configured database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(settings.BASE_DIR / 'db.sqlite3'),
+                            help="SQLite file to read (default: db.sqlite3)")
+        parser.add_argument('--database', default='default', help="Target database alias, already migrated")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per INSERT")
+        parser.add_argument('--replace', action='store_true', help="Delete the rows the target already has")
+
+    def handle(self, *args, **options):
+        path, target = options['path'], options['database']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+        target_name = str(connections[target].settings_dict['NAME'])
+        if connections[target].vendor == 'sqlite' and os.path.abspath(target_name) == os.path.abspath(path):
+            raise CommandError("The target database is the file being imported; set DATABASE_URL first")
+        with sqlite_connection(path) as source:
+            self.check_migrations(source, target, path)
+            models = [model for model in apps.get_models(include_auto_created=True)
+                      if model._meta.managed and not model._meta.proxy and router.allow_migrate_model(target, model)]
+            with transaction.atomic(using=target):
+                self.clear(models, target, options['replace'])
+                for model in models:
+                    copied = self.copy(model, source, target, options['batch_size'])
+                    if model._base_manager.using(target).count() != copied:
+                        raise CommandError(f"{model._meta.label}: row counts differ after the copy")
+                    if copied:
+                        self.stdout.write(f"{model._meta.label:<40}{copied:>10}")
+                # Explicit ids were inserted: move the sequences past them
+                with connections[target].cursor() as cursor:
+                    for sql in connections[target].ops.sequence_reset_sql(no_style(), models):
+                        cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(f"Imported {path} into the '{target}' database"))
+
+    def check_migrations(self, source, target, path):
+        applied = {alias: set(MigrationRecorder(connections[alias]).applied_migrations()) for alias in (source, target)}
+        if applied[target] - applied[source]:
+            raise CommandError(f"{path} is behind the code; run `DATABASE_URL=sqlite:///{os.path.abspath(path)} "
+                               "python manage.py migrate` first")
+        if applied[source] - applied[target]:
+            raise CommandError(f"The '{target}' database is not fully migrated; run `python manage.py migrate` first")
+
+    def clear(self, models, target, replace):
+        # migrate creates content types and permissions; they are replaced by the source's, ids included
+        generated = {'contenttypes.ContentType', 'auth.Permission'}
+        filled = [model._meta.label for model in models
+                  if model._meta.label not in generated and model._base_manager.using(target).exists()]
+        if filled and not replace:
+            raise CommandError(f"The '{target}' database already has data ({', '.join(filled[:5])}); "
+                               "pass --replace to delete it")
+        connection = connections[target]
+        # PostgreSQL cannot TRUNCATE tables with deferred foreign key checks pending in this transaction
+        connection.check_constraints()
+        tables = [model._meta.db_table for model in models]
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, allow_cascade=True))
+
+    def copy(self, model, source, target, batch_size):
+        copied, batch = 0, []
+        with keep_timestamps(model):
+            # Foreign keys are checked at commit, so tables can go in any order
+            for row in model._base_manager.using(source).order_by('pk').iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) == batch_size:
+                    model._base_manager.using(target).bulk_create(batch)
+                    copied, batch = copied + len(batch), []
+            model._base_manager.using(target).bulk_create(batch)
+        return copied + len(batch)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import media, renditions
+
+
+class Command(BaseCommand):
+    help = ("Build queued image renditions, transcode queued gallery videos, extract poster frames "
+            "and fill in durations")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process what is due now and exit")
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to sleep when nothing is queued (default: 5)")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                built = renditions.build_pending()
+                if built:
+                    self.stdout.write(f"Built renditions of {built} image(s)")
+                job = media.claim()
+                if job:
+                    job = media.process(job)
+                    self.stdout.write(f"{job.source}: {job.status}"
+                                      + (f" ({job.last_error})" if job.last_error else ""))
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
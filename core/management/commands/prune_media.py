@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import MediaBlob
+
+
+class Command(BaseCommand):
+    help = "Delete stored uploads that no gallery, photo or representative refers to any more"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=float, default=24.0,
+                            help="Hours a file must have been unreferenced before it is deleted (default: 24)")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be deleted")
+
+    def handle(self, *args, **options):
+        # The grace period covers uploads whose row is not saved yet and
+        # players still showing content that was just replaced
+        cutoff = timezone.now() - timedelta(hours=options['grace'])
+        unused = MediaBlob.objects.filter(refcount=0).filter(
+            Q(released_at__lt=cutoff) | Q(released_at__isnull=True, created_at__lt=cutoff)
+        )
+        deleted = freed = 0
+        for blob in unused.iterator():
+            if options['dry_run']:
+                self.stdout.write(blob.name)
+            else:
+                # Re-checked in the delete, so a file retained or uploaded again
+                # meanwhile is kept; the file goes in the same transaction, which
+                # an upload of the same bytes waits for (ContentAddressedStorage.save)
+                with transaction.atomic():
+                    if not unused.filter(pk=blob.pk).delete()[0]:
+                        continue
+                    default_storage.delete(blob.name)
+            deleted += 1
+            freed += blob.size
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(f"{verb} {deleted} files ({freed / 1024 / 1024:.1f} MB)")
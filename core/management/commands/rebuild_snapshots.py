@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import snapshots, versioning
+from core.models import Device
+
+
+class Command(BaseCommand):
+    help = "Pre-render every device's player payload snapshot and delete those of removed devices"
+
+    def add_arguments(self, parser):
+        parser.add_argument('devices', nargs='*', type=int, help="Only these device ids")
+
+    def handle(self, *args, **options):
+        devices = Device.objects.order_by('pk')
+        if options['devices']:
+            devices = devices.filter(pk__in=options['devices'])
+        started, built = time.perf_counter(), 0
+        for device in devices.iterator():
+            stamp = versioning.device_stamp(device.pk)
+            if stamp.last_modified is None:
+                # Never versioned (bulk inserted): give it a counter so it can be snapshotted
+                versioning.bump(versioning.device_key(device.pk))
+                stamp = versioning.device_stamp(device.pk)
+            snapshots.build(device, stamp)
+            built += 1
+        removed = 0 if options['devices'] else snapshots.prune(Device.objects.values_list('pk', flat=True))
+        self.stdout.write(f"Built {built} snapshots in {time.perf_counter() - started:.2f}s, removed {removed} stale")
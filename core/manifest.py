@@ -0,0 +1,107 @@
+"""
+Media manifests for players.
+
+Lists the files a device's playlist shows, the way the player requests
+them: the rendition its screen width picks, the processed video and its
+poster. Sizes come with each URL so the player's service worker
+(templates/player/sw.js) can keep its cache within budget, and the
+player can preload upcoming gallery items within its memory budget.
+"""
+from django.conf import settings
+from django.core.files.storage import storages
+
+from . import renditions
+from .media import is_video
+from .models import Representative
+from .playlist import gallery_rotation
+
+DEFAULT_WIDTH = 1920
+MAX_WIDTH = 7680
+REPRESENTATIVE_PHOTO_WIDTH = 160  # what renderRepresentative() in display.html asks for
+
+
+def screen_width(value):
+    """The ?width= a player sent, clamped; DEFAULT_WIDTH when missing or invalid."""
+    try:
+        return min(max(int(value), 1), MAX_WIDTH)
+    except (TypeError, ValueError):
+        return DEFAULT_WIDTH
+
+
+def _entry(storage, name, request):
+    try:
+        size = storage.size(name)
+    except OSError:
+        return None  # referenced but missing on disk; the player falls back by itself
+    url = storage.url(name)
+    return {'url': request.build_absolute_uri(url) if request else url, 'size': size}
+
+
+def _image(field_file, record, width, request):
+    variant = renditions.variant_for(record, width)
+    if variant:
+        return _entry(storages['renditions'], variant['webp'], request)
+    return _entry(field_file.storage, field_file.name, request)
+
+
+def gallery_media(gallery, width, request=None):
+    """Entries for what displayGallery() loads for this gallery."""
+    if gallery.youtube_url or not gallery.cover_image:
+        return []
+    if is_video(gallery.cover_image.name):
+        files = [gallery.video or gallery.cover_image] + ([gallery.poster] if gallery.poster else [])
+        entries = [_entry(f.storage, f.name, request) for f in files]
+    else:
+        entries = [_image(gallery.cover_image, gallery.cover_renditions, width, request)]
+    return [entry for entry in entries if entry]
+
+
+def gallery_kind(gallery):
+    if gallery.youtube_url:
+        return 'youtube'
+    if not gallery.cover_image:
+        return 'text'
+    return 'video' if is_video(gallery.cover_image.name) else 'image'
+
+
+def representative_media(representative, request=None):
+    if not representative.photo:
+        return []
+    entry = _image(representative.photo, representative.photo_renditions, REPRESENTATIVE_PHOTO_WIDTH, request)
+    return [entry] if entry else []
+
+
+def precache(device, width, request=None):
+    """Every media file on the device's playlist, each URL once."""
+    entries = {}
+    for gallery in gallery_rotation():
+        for entry in gallery_media(gallery, width, request):
+            entries.setdefault(entry['url'], entry)
+    for representative in Representative.objects.filter(is_active=True).order_by('order', 'full_name'):
+        for entry in representative_media(representative, request):
+            entries.setdefault(entry['url'], entry)
+    return {
+        'device': device.pk,
+        'width': width,
+        'budget': settings.PLAYER_CACHE_BUDGET_MB * 1024 * 1024,
+        'entries': list(entries.values()),
+    }
+
+
+def prefetch(device, width, request=None):
+    """
+    The gallery rotation in playback order: what each item loads (the main
+    file first), its total size and how many seconds it stays on screen.
+    YouTube items have no duration; they advance when the video ends.
+    """
+    items = []
+    for gallery in gallery_rotation():
+        media = gallery_media(gallery, width, request)
+        items.append({
+            'id': gallery.pk,
+            'kind': gallery_kind(gallery),
+            'duration': None if gallery.youtube_url else gallery.duration,
+            'bytes': sum(entry['size'] for entry in media),
+            'media': media,
+        })
+    return {'device': device.pk, 'width': width, 'items': items}
@@ -0,0 +1,186 @@
+"""
+Background processing of gallery video uploads.
+
+Saving a Gallery whose cover is a video only queues a MediaJob, so the
+upload request returns right away. The worker (`manage.py process_media`)
+probes the upload, re-encodes it to the capped MEDIA_VIDEO_* profile,
+grabs a poster frame and fills in Gallery.duration. Players keep playing
+the original until the processed file is ready.
+"""
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import storage, versioning
+from .models import Gallery, MediaJob
+from .outbox import backoff
+
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.ogg')
+MAX_ATTEMPTS = 3
+CLAIM_LEASE = 60 * 60  # a job whose worker died is picked up again after this
+
+
+class MediaError(Exception):
+    pass
+
+
+def is_video(name):
+    return bool(name) and name.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def enqueue(gallery):
+    """Queue processing for the gallery's current cover if it is a new video."""
+    source = gallery.cover_image.name if gallery.cover_image else ''
+    if not is_video(source):
+        if gallery.video:
+            # The cover is no longer a video: drop the outputs of the old one
+            _clear_outputs(gallery)
+        return None
+
+    job, created = MediaJob.objects.get_or_create(gallery=gallery, source=source)
+    if created and gallery.video:
+        # Until the new upload is processed, players fall back to the original
+        _clear_outputs(gallery)
+    return job
+
+
+def _clear_outputs(gallery):
+    stale = [gallery.video.name, gallery.poster.name]
+    Gallery.objects.filter(pk=gallery.pk).update(video='', poster='')
+    gallery.video, gallery.poster = '', ''
+    storage.release(stale)
+
+
+def claim():
+    """Take the next due job, or None. Jobs of crashed workers come back after CLAIM_LEASE."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = MediaJob.objects.filter(status__in=('pending', 'processing'), next_attempt_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        job = due.order_by('next_attempt_at', 'pk').first()
+        if job is None:
+            return None
+        job.status, job.progress, job.attempts = 'processing', 0, job.attempts + 1
+        job.next_attempt_at = now + timedelta(seconds=CLAIM_LEASE)
+        job.save(update_fields=['status', 'progress', 'attempts', 'next_attempt_at'])
+    return job
+
+
+def run_ffmpeg(args, duration=None, on_progress=None):
+    cmd = [settings.FFMPEG_BINARY, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y']
+    if on_progress:
+        cmd += ['-progress', 'pipe:1', '-nostats']
+    process = subprocess.Popen(cmd + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        key, _, value = line.strip().partition('=')
+        # out_time_ms is microseconds too (an old ffmpeg misnomer)
+        if on_progress and duration and key in ('out_time_us', 'out_time_ms') and value.isdigit():
+            on_progress(min(int(int(value) / 1e6 / duration * 100), 99))
+    errors = process.stderr.read()
+    if process.wait():
+        raise MediaError(errors.strip()[-1000:] or f"ffmpeg exited with status {process.returncode}")
+
+
+def probe(path):
+    """Duration of a media file in seconds."""
+    result = subprocess.run(
+        [settings.FFPROBE_BINARY, '-v', 'error', '-show_entries', 'format=duration',
+         '-of', 'default=noprint_wrappers=1:nokey=1', path],
+        capture_output=True, text=True,
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        raise MediaError(result.stderr.strip()[-1000:] or "ffprobe could not read the file")
+
+
+def transcode(source, target, duration, on_progress=None):
+    bitrate = settings.MEDIA_VIDEO_BITRATE
+    run_ffmpeg([
+        '-i', source,
+        # Never upscale; -2 keeps the width even as H.264 requires
+        '-vf', f"scale=-2:'min({settings.MEDIA_VIDEO_MAX_HEIGHT},ih)'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+        '-b:v', bitrate, '-maxrate', bitrate, '-bufsize', bitrate,
+        '-c:a', 'aac', '-b:a', '128k',
+        '-movflags', '+faststart',
+        target,
+    ], duration, on_progress)
+
+
+def extract_poster(source, target, at):
+    run_ffmpeg(['-ss', f'{at:.2f}', '-i', source, '-frames:v', '1',
+                '-vf', f"scale=-2:'min({settings.MEDIA_VIDEO_MAX_HEIGHT},ih)'", target])
+
+
+def process(job):
+    """Run one claimed job; marks it done, or schedules a retry / fails it."""
+    gallery = job.gallery
+    if gallery.cover_image.name != job.source:
+        return _finish(job, 'failed', "Replaced by a newer upload before it was processed")
+
+    def report(progress):
+        if progress >= job.progress + 5:
+            job.progress = progress
+            MediaJob.objects.filter(pk=job.pk).update(progress=progress)
+
+    stale = [gallery.video.name, gallery.poster.name]
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            source = _local_copy(gallery.cover_image, workdir)
+            duration = probe(source)
+            stem = os.path.splitext(os.path.basename(job.source))[0]
+            video, poster = os.path.join(workdir, f'{stem}.mp4'), os.path.join(workdir, f'{stem}.jpg')
+            transcode(source, video, duration, report)
+            extract_poster(source, poster, at=min(1.0, duration / 2))
+
+            with open(video, 'rb') as f:
+                gallery.video.save(os.path.basename(video), File(f), save=False)
+            with open(poster, 'rb') as f:
+                gallery.poster.save(os.path.basename(poster), File(f), save=False)
+    except (MediaError, OSError) as e:
+        if job.attempts >= MAX_ATTEMPTS:
+            return _finish(job, 'failed', str(e))
+        job.status, job.last_error = 'pending', str(e)[:1000]
+        job.next_attempt_at = timezone.now() + backoff(job.attempts)
+        job.save(update_fields=['status', 'last_error', 'next_attempt_at'])
+        return job
+
+    fields = {'video': gallery.video.name, 'poster': gallery.poster.name}
+    if gallery.duration == Gallery._meta.get_field('duration').default:
+        # Left at the default: show the gallery for as long as the video runs
+        fields['duration'] = max(math.ceil(duration), 1)
+    # update() rather than save(): no audit entry or re-queue from the post_save
+    # signals. The filter skips galleries whose cover was replaced meanwhile.
+    if Gallery.objects.filter(pk=gallery.pk, cover_image=job.source).update(**fields):
+        storage.sync(stale, [fields['video'], fields['poster']])
+        versioning.bump_content(Gallery)
+    return _finish(job, 'done')
+
+
+def _local_copy(field_file, workdir):
+    """A filesystem path ffmpeg can read, copying out of non-local storages."""
+    try:
+        return field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        path = os.path.join(workdir, 'source' + os.path.splitext(field_file.name)[1])
+        with field_file.storage.open(field_file.name, 'rb') as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        return path
+
+
+def _finish(job, status, error=''):
+    job.status, job.last_error, job.finished_at = status, error[:1000], timezone.now()
+    if status == 'done':
+        job.progress = 100
+    job.save(update_fields=['status', 'last_error', 'finished_at', 'progress'])
+    return job
@@ -0,0 +1,149 @@
+"""
+Serving of uploaded media.
+
+Replaces django.conf.urls.static, which only works with DEBUG on and
+re-sends whole files: this view answers conditional requests with 304,
+single byte ranges with 206 (video seeking), and marks content-addressed
+names as immutable so screens never fetch them twice. File bodies go out
+through the server's wsgi.file_wrapper (sendfile() under gunicorn), or as
+an X-Accel-Redirect to nginx when MEDIA_ACCEL_REDIRECT is set.
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .storage import PREFIX as CONTENT_ADDRESSED_PREFIX
+
+# Names that embed a hash of their bytes: uploads and image renditions
+IMMUTABLE_PREFIXES = (CONTENT_ADDRESSED_PREFIX, 'renditions/')
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def byte_range(header, size):
+    """
+    The inclusive (start, end) of a single-range Range header, or None when
+    the whole file should be sent (no header, a malformed one, or several
+    ranges, which servers may answer in full).
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first:
+            # bytes=-N: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable
+            return max(size - length, 0), size - 1
+        start, end = int(first), int(last) if last else None
+    except ValueError:
+        return None
+    if end is not None and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+class FileRange:
+    """
+    Bytes [start, start + length) of an open file. Keeps fileno() so that
+    gunicorn can still sendfile() the slice; it starts at the current offset
+    and stops at Content-Length.
+    """
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file, self.remaining = file, length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    name = path.replace('\\', '/')
+    if name.startswith(CONTENT_ADDRESSED_PREFIX):
+        etag = quote_etag(os.path.splitext(os.path.basename(name))[0])
+    else:
+        etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+
+    # Headers shared by 200, 206 and 304
+    headers = HttpResponse()
+    headers['ETag'] = etag
+    headers['Last-Modified'] = http_date(last_modified)
+    headers['Accept-Ranges'] = 'bytes'
+    if name.startswith(IMMUTABLE_PREFIXES):
+        patch_cache_control(headers, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    else:
+        # Upload names are never reused, but nothing guarantees it: revalidate
+        patch_cache_control(headers, public=True, no_cache=True)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=headers)
+    if response is not headers:
+        return response
+
+    size, span = stat.st_size, None
+    if_range = request.headers.get('If-Range')
+    if 'Range' in request.headers and (not if_range or if_range in (etag, headers['Last-Modified'])):
+        try:
+            span = byte_range(request.headers['Range'], size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    if settings.MEDIA_ACCEL_REDIRECT:
+        # nginx streams the file and applies the Range itself
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT + quote(name)
+    else:
+        start, end = span or (0, size - 1)
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+        else:
+            file = open(fullpath, 'rb')
+            response = FileResponse(FileRange(file, start, end - start + 1) if span else file,
+                                    content_type=content_type)
+            response.block_size = CHUNK_SIZE
+        response['Content-Length'] = end - start + 1
+        if span:
+            response.status_code = 206
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    for header in ('ETag', 'Last-Modified', 'Accept-Ranges', 'Cache-Control'):
+        response[header] = headers[header]
+    return response
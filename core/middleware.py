@@ -1,12 +1,86 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
 from .signals import _thread_locals
+from . import audit, compression
+
+
+class AsyncCapableMiddleware:
+    """
+    Base for middleware that runs as a coroutine when the rest of the chain
+    is async (ASGI), so async views are not pushed into a thread by it.
+    """
+    sync_capable = True
+    async_capable = True
 
-class AuditLogMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process(request)
+
+
+class AuditLogMiddleware(AsyncCapableMiddleware):
+    def process(self, request):
         _thread_locals.user = request.user if request.user.is_authenticated else None
-        response = self.get_response(request)
+        # Audit entries of the whole request are written with one bulk insert
+        with audit.buffered():
+            response = self.get_response(request)
         # Clean up
         _thread_locals.user = None
         return response
+
+    async def __acall__(self, request):
+        user = await request.auser()
+        _thread_locals.user = user if user.is_authenticated else None
+        async with audit.abuffered():
+            response = await self.get_response(request)
+        _thread_locals.user = None
+        return response
+
+
+class CompressionMiddleware(AsyncCapableMiddleware):
+    """gzip / Brotli for API JSON and pages (core/compression.py). Goes near the top, like GZipMiddleware."""
+    def process(self, request):
+        return compression.compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return compression.compress_response(request, await self.get_response(request))
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise in an async chain. WhiteNoiseMiddleware is sync only, so under
+    ASGI every request would pass it in a thread; here only static files do.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        path = request.path_info
+        if not self.autorefresh:
+            static_file = self.files.get(path)
+        elif path.startswith(self.static_prefix):
+            # DEBUG: looked up on disk per request, as WhiteNoise does
+            static_file = await sync_to_async(self.find_file)(path)
+        else:
+            static_file = None
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
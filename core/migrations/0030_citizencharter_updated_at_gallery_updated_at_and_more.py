@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0029_representative"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="citizencharter",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="gallery",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="photo",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="representative",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
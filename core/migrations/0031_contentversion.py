@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_device_versions(apps, schema_editor):
+    Device = apps.get_model("core", "Device")
+    ContentVersion = apps.get_model("core", "ContentVersion")
+    ContentVersion.objects.bulk_create(
+        [ContentVersion(key=f"device:{pk}", version=1) for pk in Device.objects.values_list("pk", flat=True)],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0030_citizencharter_updated_at_gallery_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContentVersion",
+            fields=[
+                ("key", models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ("version", models.PositiveBigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "verbose_name": "सामग्री संस्करण",
+                "verbose_name_plural": "सामग्री संस्करणहरू",
+            },
+        ),
+        migrations.RunPython(seed_device_versions, migrations.RunPython.noop),
+    ]
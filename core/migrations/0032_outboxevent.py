@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0031_contentversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEvent",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("event", models.CharField(max_length=50)),
+                ("dedupe_key", models.CharField(max_length=150, unique=True)),
+                ("payload", models.JSONField()),
+                ("status", models.CharField(choices=[("pending", "बाँकी (Pending)"), ("sent", "पठाइयो (Sent)"), ("failed", "असफल (Failed)")], default="pending", max_length=20)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "आउटबक्स घटना",
+                "verbose_name_plural": "आउटबक्स घटनाहरू",
+                "indexes": [models.Index(fields=["status", "next_attempt_at"], name="core_outbox_status_323beb_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0033_alter_auditlog_timestamp"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="device",
+            name="telemetry",
+            field=models.JSONField(blank=True, default=dict, verbose_name="टेलिमेट्री"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0034_device_telemetry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gallery",
+            name="cover_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="कभर फोटोका साइजहरू"),
+        ),
+        migrations.AddField(
+            model_name="photo",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="फोटोका साइजहरू"),
+        ),
+        migrations.AddField(
+            model_name="representative",
+            name="photo_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="फोटोका साइजहरू"),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0035_image_renditions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gallery",
+            name="poster",
+            field=models.ImageField(blank=True, editable=False, upload_to="gallery/posters/", verbose_name="पोस्टर"),
+        ),
+        migrations.AddField(
+            model_name="gallery",
+            name="video",
+            field=models.FileField(blank=True, editable=False, upload_to="gallery/videos/", verbose_name="प्रशोधित भिडियो"),
+        ),
+        migrations.CreateModel(
+            name="MediaJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("source", models.CharField(max_length=255)),
+                ("status", models.CharField(choices=[("pending", "पर्खिरहेको (Pending)"), ("processing", "प्रशोधन हुँदै (Processing)"), ("done", "तयार (Ready)"), ("failed", "असफल (Failed)")], default="pending", max_length=20)),
+                ("progress", models.PositiveSmallIntegerField(default=0)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("gallery", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="media_jobs", to="core.gallery")),
+            ],
+            options={
+                "verbose_name": "मिडिया प्रशोधन",
+                "verbose_name_plural": "मिडिया प्रशोधनहरू",
+                "indexes": [models.Index(fields=["status", "next_attempt_at"], name="core_mediaj_status_550c3b_idx")],
+                "constraints": [models.UniqueConstraint(fields=("gallery", "source"), name="unique_media_job_source")],
+            },
+        ),
+    ]
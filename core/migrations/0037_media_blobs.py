@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0036_media_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaBlob",
+            fields=[
+                ("name", models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ("size", models.BigIntegerField(default=0)),
+                ("refcount", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("released_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "मिडिया फाइल",
+                "verbose_name_plural": "मिडिया फाइलहरू",
+            },
+        ),
+    ]
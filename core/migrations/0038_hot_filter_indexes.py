@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0037_media_blobs"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(fields=["-timestamp"], name="core_auditl_timesta_189a84_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="device",
+            index=models.Index(fields=["is_active"], name="core_device_is_acti_f3ca1f_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="notice",
+            index=models.Index(fields=["status", "-published_date"], name="core_notice_status_59fc8f_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tickermessage",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["order", "-created_at"], name="ticker_active_order_idx"),
+        ),
+    ]
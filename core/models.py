@@ -2,6 +2,7 @@ from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 import uuid
 
 # User model is already defined in existing file, we will append to it or rewrite the file.
@@ -42,6 +43,8 @@ class Device(models.Model):
     location_description = models.CharField(max_length=200, verbose_name="राखेको स्थान")
     is_active = models.BooleanField(default=True, verbose_name="सक्रिय")
     last_seen = models.DateTimeField(null=True, blank=True, verbose_name="अन्तिम पटक देखिएको")
+    # Latest player report sent with a heartbeat (uptime, current_item, fps)
+    telemetry = models.JSONField(default=dict, blank=True, verbose_name="टेलिमेट्री")
     
     def __str__(self):
         return self.name
@@ -49,6 +52,8 @@ class Device(models.Model):
     class Meta:
         verbose_name = "डिजिटल सूचना पाटी"
         verbose_name_plural = "डिजिटल सूचना पाटीहरू"
+        # The dashboard's active screen count reads this instead of every row (telemetry included)
+        indexes = [models.Index(fields=['is_active'])]
 
 
 class Notice(models.Model):
@@ -86,6 +91,9 @@ class Notice(models.Model):
     class Meta:
         verbose_name = "सूचना"
         verbose_name_plural = "सूचनाहरू"
+        # published_notices() newest first without a sort, status counts, and the
+        # dashboard's published-today range
+        indexes = [models.Index(fields=['status', '-published_date'])]
 
 
 class Gallery(models.Model):
@@ -98,10 +106,15 @@ class Gallery(models.Model):
         verbose_name="कभर फोटो / भिडियो",
         validators=[FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'mp4', 'webm', 'ogg'])]
     )
+    cover_renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name="कभर फोटोका साइजहरू")
+    # Written by the media worker (core/media.py) when the cover is a video
+    video = models.FileField(upload_to='gallery/videos/', blank=True, editable=False, verbose_name="प्रशोधित भिडियो")
+    poster = models.ImageField(upload_to='gallery/posters/', blank=True, editable=False, verbose_name="पोस्टर")
     youtube_url = models.URLField(blank=True, null=True, verbose_name="YouTube URL", help_text="YouTube video URL (e.g., https://www.youtube.com/watch?v=dQw4w9WgXcQ)")
     duration = models.PositiveIntegerField(default=10, verbose_name="देखाउने समय (सेकेन्डमा)", help_text="कति सेकेन्ड सम्म देखाउने? (Duration in seconds)")
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="सिर्जनाकर्ता")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
@@ -111,10 +124,44 @@ class Gallery(models.Model):
         verbose_name_plural = "फोटो ग्यालरी"
 
 
+class MediaJob(models.Model):
+    """
+    Processing of one uploaded gallery video, queued when the upload is
+    saved and run by `manage.py process_media`.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'पर्खिरहेको (Pending)'),
+        ('processing', 'प्रशोधन हुँदै (Processing)'),
+        ('done', 'तयार (Ready)'),
+        ('failed', 'असफल (Failed)'),
+    )
+
+    gallery = models.ForeignKey(Gallery, related_name='media_jobs', on_delete=models.CASCADE)
+    source = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "मिडिया प्रशोधन"
+        verbose_name_plural = "मिडिया प्रशोधनहरू"
+        constraints = [models.UniqueConstraint(fields=['gallery', 'source'], name='unique_media_job_source')]
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+
 class Photo(models.Model):
     gallery = models.ForeignKey(Gallery, related_name='photos', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='gallery/', verbose_name="फोटो")
+    renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name="फोटोका साइजहरू")
     caption = models.CharField(max_length=200, blank=True, verbose_name="क्याप्सन")
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "फोटो"
@@ -127,6 +174,7 @@ class CitizenCharter(models.Model):
     service_fee = models.CharField(max_length=100, verbose_name="सेवा शुल्क")
     responsible_officer = models.CharField(max_length=100, verbose_name="जिम्मेवार अधिकारी / शाखा")
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="सिर्जनाकर्ता")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.service_name
@@ -143,12 +191,14 @@ class AuditLog(models.Model):
     object_id = models.CharField(max_length=50, null=True)
     details = models.TextField(blank=True)
     ip_address = models.GenericIPAddressField(null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the action happened, not when the buffered entry is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['-timestamp']
         verbose_name = "सम्परीक्षण लग" # Audit Log
         verbose_name_plural = "सम्परीक्षण लगहरू"
+        indexes = [models.Index(fields=['-timestamp'])]
 
 
 class Contact(models.Model):
@@ -209,6 +259,9 @@ class TickerMessage(models.Model):
         verbose_name = "टिकर सन्देश"
         verbose_name_plural = "टिकर सन्देशहरू"
         ordering = ['order', '-created_at']
+        # What players get: the active messages in display order
+        indexes = [models.Index(fields=['order', '-created_at'], condition=models.Q(is_active=True),
+                                name='ticker_active_order_idx')]
 
 
 class Representative(models.Model):
@@ -229,9 +282,11 @@ class Representative(models.Model):
     phone_number = models.CharField(max_length=15, blank=True, verbose_name="फोन नं.")
     email = models.EmailField(blank=True, verbose_name="इमेल")
     photo = models.ImageField(upload_to='representatives/', blank=True, null=True, verbose_name="फोटो")
+    photo_renditions = models.JSONField(default=dict, blank=True, editable=False, verbose_name="फोटोका साइजहरू")
     order = models.PositiveIntegerField(default=0, verbose_name="क्रम")
     is_active = models.BooleanField(default=True, verbose_name="सक्रिय")
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="सिर्जनाकर्ता")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def get_display_designation(self):
         if self.designation == 'अन्य' and self.custom_designation:
@@ -247,3 +302,72 @@ class Representative(models.Model):
         ordering = ['order', 'full_name']
 
 
+
+
+class ContentVersion(models.Model):
+    """
+    Monotonic change counters for what players display, maintained by
+    core.signals. A key is either a model label ("core.notice") or a
+    device scope ("device:<pk>") that moves whenever anything on that
+    device's playlist changes.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key}@{self.version}"
+
+    class Meta:
+        verbose_name = "सामग्री संस्करण"
+        verbose_name_plural = "सामग्री संस्करणहरू"
+
+
+class OutboxEvent(models.Model):
+    """
+    Outgoing webhook, written in the same transaction as the change that
+    caused it and delivered later by `manage.py dispatch_outbox`.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'बाँकी (Pending)'),
+        ('sent', 'पठाइयो (Sent)'),
+        ('failed', 'असफल (Failed)'),
+    )
+
+    event = models.CharField(max_length=50)
+    dedupe_key = models.CharField(max_length=150, unique=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "आउटबक्स घटना"
+        verbose_name_plural = "आउटबक्स घटनाहरू"
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+
+class MediaBlob(models.Model):
+    """
+    One stored upload in the content-addressed media storage
+    (core/storage.py), shared by every field that holds the same bytes.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+    class Meta:
+        verbose_name = "मिडिया फाइल"
+        verbose_name_plural = "मिडिया फाइलहरू"
+
@@ -2,53 +2,121 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from django.utils import timezone
+from datetime import datetime, time, timedelta
 import nepali_datetime
 
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def get_nepali_date(request):
+# Nepali month names
+NEPALI_MONTHS = {
+    1: 'बैशाख', 2: 'जेठ', 3: 'असार', 4: 'साउन',
+    5: 'भदौ', 6: 'असोज', 7: 'कार्तिक', 8: 'मंसिर',
+    9: 'पुष', 10: 'माघ', 11: 'फागुन', 12: 'चैत्र'
+}
+
+# Nepali weekday names (Python weekday(): Monday = 0)
+NEPALI_WEEKDAYS = {
+    0: 'सोमबार', 1: 'मंगलबार', 2: 'बुधबार', 3: 'बिहिबार',
+    4: 'शुक्रबार', 5: 'शनिबार', 6: 'आइतबार'
+}
+
+NEPALI_DIGITS = ['०', '१', '२', '३', '४', '५', '६', '७', '८', '९']
+
+
+def to_nepali_number(num):
+    """Convert the ASCII digits of num to Devanagari digits."""
+    return ''.join(NEPALI_DIGITS[int(d)] if d.isdigit() else d for d in str(num))
+
+
+def month_lengths(year):
+    """Days in each month of a BS year, or None outside the supported range."""
+    # The last supported year has no next Baisakh 1 to count its Chaitra to
+    if not nepali_datetime.MINYEAR <= year < nepali_datetime.MAXYEAR:
+        return None
+    starts = [nepali_datetime.date(year, month, 1) for month in range(1, 13)]
+    starts.append(nepali_datetime.date(year + 1, 1, 1))
+    return [(following - start).days for start, following in zip(starts, starts[1:])]
+
+
+def build_calendar_slice(now):
     """
-    API endpoint to get current Nepali date and time
-    Returns Bikram Sambat date in Nepali Unicode
+    Everything the player needs to run its clock locally for a day:
+    the BS date anchored to today's AD date, month tables for this and
+    next BS year, the names to render with and the server epoch so the
+    client can measure its own clock offset.
     """
-    # Use Django local time so weekday/date are calculated in configured timezone.
-    now = timezone.localtime()
-    
+    nepali_today = nepali_datetime.date.from_datetime_date(now.date())
+    next_midnight = timezone.make_aware(
+        datetime.combine(now.date() + timedelta(days=1), time.min),
+        now.tzinfo,
+    )
+
+    month_days = {}
+    for year in (nepali_today.year, nepali_today.year + 1):
+        lengths = month_lengths(year)
+        if lengths:
+            month_days[str(year)] = lengths
+
+    return {
+        'mode': 'calendar',
+        'server_epoch_ms': int(now.timestamp() * 1000),
+        'utc_offset_minutes': int(now.utcoffset().total_seconds() // 60),
+        'anchor': {
+            'ad': now.date().isoformat(),
+            'bs': {
+                'year': nepali_today.year,
+                'month': nepali_today.month,
+                'day': nepali_today.day,
+            },
+        },
+        'month_days': month_days,
+        'months': [NEPALI_MONTHS[m] for m in range(1, 13)],
+        # Ordered Sunday first to match JavaScript's Date.getUTCDay().
+        'weekdays': [NEPALI_WEEKDAYS[(d + 6) % 7] for d in range(7)],
+        'digits': NEPALI_DIGITS,
+        'meridiem': {'am': 'बिहान', 'pm': 'बेलुका'},
+        'valid_until': next_midnight.isoformat(),
+    }
+
+
+def build_current_date(now):
+    """The BS date and 12-hour time of now, in Nepali."""
     # Convert to Nepali datetime
     nepali_now = nepali_datetime.date.from_datetime_date(now.date())
-    
-    # Nepali month names
-    nepali_months = {
-        1: 'बैशाख', 2: 'जेठ', 3: 'असार', 4: 'साउन',
-        5: 'भदौ', 6: 'असोज', 7: 'कार्तिक', 8: 'मंसिर',
-        9: 'पुष', 10: 'माघ', 11: 'फागुन', 12: 'चैत्र'
-    }
-    
-    # Nepali weekday names
-    nepali_weekdays = {
-        0: 'सोमबार', 1: 'मंगलबार', 2: 'बुधबार', 3: 'बिहिबार',
-        4: 'शुक्रबार', 5: 'शनिबार', 6: 'आइतबार'
-    }
-    
-    # Convert numbers to Nepali
-    def to_nepali_number(num):
-        nepali_digits = {'0': '०', '1': '१', '2': '२', '3': '३', '4': '४',
-                        '5': '५', '6': '६', '7': '७', '8': '८', '9': '९'}
-        return ''.join(nepali_digits.get(d, d) for d in str(num))
-    
+
     # Format the date
     year = to_nepali_number(nepali_now.year)
-    month = nepali_months[nepali_now.month]
+    month = NEPALI_MONTHS[nepali_now.month]
     day = to_nepali_number(nepali_now.day)
-    weekday = nepali_weekdays[now.weekday()]
-    
+    weekday = NEPALI_WEEKDAYS[now.weekday()]
+
     # Format time
     hour = to_nepali_number(now.strftime('%I'))
     minute = to_nepali_number(now.strftime('%M'))
     am_pm = 'बिहान' if now.hour < 12 else 'बेलुका'
-    
-    return Response({
+
+    return {
         'date': f'{year} {month} {day}, {weekday}',
         'time': f'{hour}:{minute} {am_pm}',
         'timestamp': now.isoformat()
-    })
+    }
+
+
+def nepali_date_payload(mode=None):
+    """What /api/v1/nepali-date/ returns for ?mode= (see get_nepali_date)."""
+    # Use Django local time so weekday/date are calculated in configured timezone.
+    now = timezone.localtime()
+    if mode == 'calendar':
+        return build_calendar_slice(now)
+    return build_current_date(now)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_nepali_date(request):
+    """
+    API endpoint to get current Nepali date and time
+    Returns Bikram Sambat date in Nepali Unicode
+
+    With ?mode=calendar it instead returns a calendar slice that lets the
+    player render the date and clock locally and resync once per day.
+    """
+    return Response(nepali_date_payload(request.query_params.get('mode')))
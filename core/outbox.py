@@ -0,0 +1,100 @@
+"""
+Transactional outbox for outgoing webhooks (n8n).
+
+Signals only insert an OutboxEvent row, inside the transaction that made
+the change, so a slow or unreachable n8n never delays a save. The
+dispatcher (`manage.py dispatch_outbox`) claims due rows in batches, posts
+them over one keep-alive session and reschedules failures with
+exponential backoff.
+"""
+import hashlib
+import json
+import random
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 30       # seconds before the first retry
+BACKOFF_MAX = 60 * 60   # cap between retries
+CLAIM_LEASE = 5 * 60    # claimed rows are hidden from other dispatchers this long
+
+
+def enqueue(event, payload, dedupe_key):
+    """Queue a webhook unless the same dedupe_key was queued before."""
+    if not getattr(settings, 'N8N_WEBHOOK_URL', None):
+        return None
+    outbox_event, _ = OutboxEvent.objects.get_or_create(
+        dedupe_key=dedupe_key,
+        defaults={'event': event, 'payload': payload},
+    )
+    return outbox_event
+
+
+def enqueue_notice_published(notice):
+    payload = {
+        'event': 'notice_published',
+        'id': notice.id,
+        'title': notice.title,
+        'content': notice.content,
+    }
+    # One delivery per notice version: re-saving unchanged content is not re-sent
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+    return enqueue('notice_published', payload, f"notice_published:{notice.id}:{digest}")
+
+
+def backoff(attempts):
+    """Delay before retry number attempts, with jitter so retries spread out."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboxEvent.objects.filter(status='pending', next_attempt_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due.order_by('next_attempt_at', 'pk')[:batch_size])
+        OutboxEvent.objects.filter(pk__in=[e.pk for e in batch]).update(
+            next_attempt_at=now + timedelta(seconds=CLAIM_LEASE))
+    return batch
+
+
+def dispatch_batch(url=None, batch_size=50, timeout=5, session=None):
+    """
+    Deliver up to batch_size due events. Returns (sent, failed) counts,
+    failed meaning rescheduled or given up on.
+    """
+    url = url or settings.N8N_WEBHOOK_URL
+    session = session or requests.Session()
+    batch = claim_batch(batch_size)
+    sent = failed = 0
+
+    for outbox_event in batch:
+        outbox_event.attempts += 1
+        try:
+            response = session.post(url, json=outbox_event.payload, timeout=timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            failed += 1
+            outbox_event.last_error = str(e)[:1000]
+            if outbox_event.attempts >= MAX_ATTEMPTS:
+                outbox_event.status = 'failed'
+            else:
+                outbox_event.next_attempt_at = timezone.now() + backoff(outbox_event.attempts)
+        else:
+            sent += 1
+            outbox_event.status = 'sent'
+            outbox_event.sent_at = timezone.now()
+            outbox_event.last_error = ''
+
+    if batch:
+        OutboxEvent.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, failed
@@ -0,0 +1,90 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class ContentCursorPagination(CursorPagination):
+    """
+    Cursor paging for every list endpoint. A page is a bounded keyset query
+    (WHERE <ordering columns> beyond the cursor ... LIMIT n), so its cost does
+    not grow with the page number the way OFFSET paging does.
+
+    The ordering comes from the view's cursor_ordering, with pk appended so
+    that no two rows share a position, and the cursor carries the values of
+    all its columns. DRF's cursor holds only the first column; rows tying on
+    it (ticker messages all at order 0) were paged by an offset, which stops
+    at offset_cutoff. Clients may ask for up to max_page_size rows with
+    ?page_size=.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-pk'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        ordering = (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        if not {'pk', 'id'} & {column.lstrip('-') for column in ordering}:
+            ordering += ('pk',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset, filtering on the whole key
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.beyond(ordering, current_position))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+        has_following_position = len(results) > len(self.page)
+        following_position = (self._get_position_from_instance(results[-1], self.ordering)
+                              if has_following_position else None)
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position, self.previous_position = following_position, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def beyond(self, ordering, position):
+        """Rows after position in ordering: (a > x) OR (a = x AND b > y) OR ..."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition, equal = Q(), Q()
+        for column, value in zip(ordering, values):
+            name = column.lstrip('-')
+            lookup = 'lt' if column.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        columns = [column.lstrip('-') for column in ordering]
+        if isinstance(instance, dict):
+            return json.dumps([str(instance[column]) for column in columns])
+        return json.dumps([str(getattr(instance, column)) for column in columns])
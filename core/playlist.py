@@ -0,0 +1,44 @@
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notice, Gallery, CitizenCharter, TickerMessage, Representative
+from .serializers import (NoticeSerializer, GallerySerializer, CitizenCharterSerializer,
+                          TickerMessageSerializer, RepresentativeSerializer)
+
+
+def published_notices(device=None):
+    """Published, unexpired notices, optionally only those targeted at one device."""
+    today = timezone.now().date()
+    notices = Notice.objects.filter(
+        Q(status='published') &
+        (Q(expiry_date__isnull=True) | Q(expiry_date__gte=today))
+    )
+    if device is not None:
+        # Single join through the target_devices table, indexed on device_id
+        notices = notices.filter(target_devices=device)
+    return notices.prefetch_related('target_devices').order_by('-published_date')
+
+
+def gallery_rotation():
+    """Galleries in the order players rotate through them."""
+    return Gallery.objects.order_by('pk')
+
+
+def build_playlist(device, context=None):
+    """Everything one player screen shows, in a single payload."""
+    context = context or {}
+    return {
+        'device': {'id': device.pk, 'name': device.name},
+        'generated_at': timezone.now().isoformat(),
+        'notices': NoticeSerializer(published_notices(device), many=True, context=context).data,
+        'charters': CitizenCharterSerializer(
+            CitizenCharter.objects.all(), many=True, context=context).data,
+        'galleries': GallerySerializer(
+            gallery_rotation().prefetch_related('photos'), many=True, context=context).data,
+        'representatives': RepresentativeSerializer(
+            Representative.objects.filter(is_active=True).order_by('order', 'full_name'),
+            many=True, context=context).data,
+        'ticker': TickerMessageSerializer(
+            TickerMessage.objects.filter(is_active=True).order_by('order', '-created_at'),
+            many=True, context=context).data,
+    }
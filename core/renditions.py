@@ -0,0 +1,156 @@
+"""
+Resized WebP/JPEG variants of uploaded images.
+
+Saving a Photo, Gallery or Representative with a new image only queues
+its renditions (queue(), from signals.py): the record is marked pending
+and players get the original until the media worker (`manage.py
+process_media`) has run build_pending(). Variants are stored in the "renditions" storage under the source's content hash and the
+target width, so the same picture uploaded twice shares its files and a new
+picture always gets new URLs.
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from PIL import Image, ImageOps
+
+from . import versioning
+from .models import Gallery, Photo, Representative
+
+# Target widths: admin thumbnails, 720p, 1080p and 4K screens
+WIDTHS = (480, 1280, 1920, 3840)
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# model -> (image field, field holding its renditions record)
+FIELDS = {
+    Photo: ('image', 'renditions'),
+    Gallery: ('cover_image', 'cover_renditions'),
+    Representative: ('photo', 'photo_renditions'),
+}
+
+
+def _encode(image, fmt, options):
+    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+    if fmt == 'JPEG' and has_alpha:
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, 'white')
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    else:
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, fmt, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def generate(field_file):
+    """
+    Write the variants of an image file and return the record to keep on
+    the model: {'source', 'hash', 'variants': [{'width', 'height', 'webp', 'jpeg'}]}.
+    Files that are not images (gallery videos) get a record without variants.
+    """
+    if not field_file:
+        return {}
+    storage = storages['renditions']
+    sha = hashlib.sha256()
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        for chunk in iter(lambda: source.read(1 << 20), b''):
+            sha.update(chunk)
+        digest = sha.hexdigest()
+        record = {'source': field_file.name, 'hash': digest, 'variants': []}
+        source.seek(0)
+        try:
+            with Image.open(source) as original:
+                image = ImageOps.exif_transpose(original)
+                image.load()
+        except (OSError, Image.DecompressionBombError):
+            return record
+
+    try:
+        for width in sorted({min(w, image.width) for w in WIDTHS}):
+            height = max(round(image.height * width / image.width), 1)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            variant = {'width': width, 'height': height}
+            for key, (fmt, extension, options) in FORMATS.items():
+                name = f'{digest[:2]}/{digest}/{width}.{extension}'
+                if not storage.exists(name):
+                    storage.save(name, _encode(resized, fmt, options))
+                variant[key] = name
+            record['variants'].append(variant)
+    except (OSError, ValueError) as e:
+        # Players keep getting the original; the record stops it being retried
+        return {**record, 'variants': [], 'error': str(e)[:200]}
+    return record
+
+
+def queue(instance):
+    """Mark instance's renditions pending if its image changed since they were built or queued."""
+    file_field, record_field = FIELDS[type(instance)]
+    name = getattr(instance, file_field).name or None
+    if (getattr(instance, record_field) or {}).get('source') == name:
+        return False
+
+    record = {'source': name, 'pending': True} if name else {}
+    setattr(instance, record_field, record)
+    # update() rather than save(): no second round of signals
+    type(instance).objects.filter(pk=instance.pk).update(**{record_field: record})
+    return True
+
+
+def build_pending():
+    """Build every queued record; the number built."""
+    built = 0
+    for model, (_, record_field) in FIELDS.items():
+        for instance in model.objects.filter(**{f'{record_field}__pending': True}).iterator():
+            built += refresh(instance)
+    return built
+
+
+def refresh(instance, force=False):
+    """Regenerate instance's renditions if they are pending or its image changed since the last run."""
+    file_field, record_field = FIELDS[type(instance)]
+    field_file = getattr(instance, file_field)
+    record = getattr(instance, record_field) or {}
+    if not force and not record.get('pending') and record.get('source') == (field_file.name or None):
+        return False
+
+    record = generate(field_file)
+    setattr(instance, record_field, record)
+    # update() rather than save(): no second round of signals. The filter
+    # skips rows whose image was replaced while this one was being built.
+    model = type(instance)
+    if model.objects.filter(pk=instance.pk, **{file_field: field_file.name or ''}).update(**{record_field: record}):
+        versioning.bump_content(model)  # players pick up the new URLs
+    return True
+
+
+def serialize(record, request=None):
+    """The variants of a record with their URLs, smallest first."""
+    storage = storages['renditions']
+
+    def url(name):
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+    return [
+        {'width': v['width'], 'height': v['height'], **{key: url(v[key]) for key in FORMATS}}
+        for v in (record or {}).get('variants', [])
+    ]
+
+
+def variant_for(record, width):
+    """The smallest variant at least `width` wide (else the largest), or None."""
+    variants = (record or {}).get('variants', [])
+    if not variants:
+        return None
+    return next((v for v in variants if v['width'] >= width), variants[-1])
+
+
+def pick(record, width, fmt='webp'):
+    """URL of variant_for(record, width) in fmt, or None."""
+    variant = variant_for(record, width)
+    return storages['renditions'].url(variant[fmt]) if variant else None
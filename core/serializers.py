@@ -1,7 +1,23 @@
 from rest_framework import serializers
 from .models import User, Device, Notice, Gallery, Photo, CitizenCharter, TickerMessage, Representative
+from . import renditions
 
-class TickerMessageSerializer(serializers.ModelSerializer):
+
+class SparseFieldsMixin:
+    """Takes fields=[...] and serializes only those (unknown names are ignored)"""
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class RenditionsField(serializers.ReadOnlyField):
+    """Resized variants of an image: [{width, height, webp, jpeg}], smallest first"""
+    def to_representation(self, value):
+        return renditions.serialize(value, self.context.get('request'))
+
+class TickerMessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = TickerMessage
         fields = '__all__'
@@ -11,40 +27,58 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'username', 'role', 'email')
 
-class DeviceSerializer(serializers.ModelSerializer):
+class DeviceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Device
         fields = '__all__'
+        read_only_fields = ('last_seen', 'telemetry')
+
+class HeartbeatSerializer(serializers.Serializer):
+    """Optional player telemetry sent with a heartbeat"""
+    uptime = serializers.IntegerField(min_value=0, required=False, help_text="Seconds since the player started")
+    current_item = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    fps = serializers.FloatField(min_value=0, required=False)
 
-class NoticeSerializer(serializers.ModelSerializer):
+class DeviceHeartbeatSerializer(HeartbeatSerializer):
+    id = serializers.IntegerField(min_value=1)
+
+class BulkHeartbeatSerializer(serializers.Serializer):
+    """Heartbeats a site gateway collected for the screens behind it"""
+    devices = DeviceHeartbeatSerializer(many=True, allow_empty=False, max_length=1000)
+
+class NoticeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notice
         fields = '__all__'
 
 class PhotoSerializer(serializers.ModelSerializer):
+    renditions = RenditionsField()
+
     class Meta:
         model = Photo
-        fields = ['id', 'image', 'caption']
+        fields = ['id', 'image', 'renditions', 'caption']
 
-class GallerySerializer(serializers.ModelSerializer):
+class GallerySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     photos = PhotoSerializer(many=True, read_only=True)
+    cover_renditions = RenditionsField()
     class Meta:
         model = Gallery
-        fields = ['id', 'title', 'description', 'cover_image', 'youtube_url', 'duration', 'created_at', 'photos']
+        fields = ['id', 'title', 'description', 'cover_image', 'cover_renditions', 'video', 'poster', 'youtube_url', 'duration', 'created_at', 'photos']
 
-class CitizenCharterSerializer(serializers.ModelSerializer):
+class CitizenCharterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CitizenCharter
         fields = '__all__'
 
 
-class RepresentativeSerializer(serializers.ModelSerializer):
+class RepresentativeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     display_designation = serializers.SerializerMethodField()
     photo_url = serializers.SerializerMethodField()
+    photo_renditions = RenditionsField()
 
     class Meta:
         model = Representative
-        fields = ['id', 'full_name', 'designation', 'display_designation', 'phone_number', 'email', 'photo', 'photo_url', 'order']
+        fields = ['id', 'full_name', 'designation', 'display_designation', 'phone_number', 'email', 'photo', 'photo_url', 'photo_renditions', 'order']
 
     def get_display_designation(self, obj):
         return obj.get_display_designation()
@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Notice, Device, User, AuditLog, Gallery, CitizenCharter
+from .models import (Notice, Device, User, Gallery, Photo, CitizenCharter,
+                     TickerMessage, Representative, ContentVersion)
+from . import versioning, outbox, audit, renditions, media, storage
 import inspect
 
 # A simple way to get user without thread locals is tricky in signals.
@@ -9,8 +11,10 @@ import inspect
 # To get the USER, we generally need middleware to set it on the thread.
 
 # Let's implement a thread local storage for user.
-import threading
-_thread_locals = threading.local()
+# asgiref's Local is per thread under WSGI, and under ASGI follows the request
+# into the thread Django runs a sync view in
+from asgiref.local import Local
+_thread_locals = Local()
 
 def get_current_user():
     return getattr(_thread_locals, 'user', None)
@@ -25,7 +29,7 @@ def log_save(sender, instance, created, **kwargs):
     action = "Created" if created else "Updated"
     model_name = sender._meta.verbose_name
     
-    AuditLog.objects.create(
+    audit.record(
         user=user,
         action=action,
         model_name=model_name,
@@ -33,20 +37,10 @@ def log_save(sender, instance, created, **kwargs):
         details=f"{model_name} {action}: {str(instance)}"
     )
 
-    # N8N Trigger for Published Notices (both on creation and update)
+    # N8N Trigger for Published Notices (both on creation and update).
+    # Queued in the outbox and delivered by the dispatch_outbox command.
     if sender == Notice and instance.status == 'published':
-        try:
-            import requests
-            from django.conf import settings
-            if hasattr(settings, 'N8N_WEBHOOK_URL'):
-                requests.post(settings.N8N_WEBHOOK_URL, json={
-                    'event': 'notice_published',
-                    'id': instance.id,
-                    'title': instance.title,
-                    'content': instance.content
-                }, timeout=2)
-        except Exception as e:
-            print(f"Failed to trigger n8n: {e}")
+        outbox.enqueue_notice_published(instance)
 
 @receiver(post_delete, sender=Notice)
 @receiver(post_delete, sender=Device)
@@ -54,10 +48,121 @@ def log_delete(sender, instance, **kwargs):
     user = get_current_user()
     model_name = sender._meta.verbose_name
     
-    AuditLog.objects.create(
+    audit.record(
         user=user,
         action="Deleted",
         model_name=model_name,
         object_id=str(instance.pk),
         details=f"{model_name} Deleted: {str(instance)}"
     )
+
+
+# Reference counts of content-addressed uploads (core/storage.py). Connected
+# before the receivers below, which may clear file fields with update().
+
+@receiver(pre_save, sender=Gallery)
+@receiver(pre_save, sender=Photo)
+@receiver(pre_save, sender=Representative)
+def remember_stored_files(sender, instance, **kwargs):
+    instance._stored_files = []
+    if instance.pk:
+        fields = [f.attname for f in storage.file_fields(sender)]
+        row = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+        instance._stored_files = [name for name in row or () if name]
+
+@receiver(post_save, sender=Gallery)
+@receiver(post_save, sender=Photo)
+@receiver(post_save, sender=Representative)
+def count_stored_files(sender, instance, **kwargs):
+    storage.sync(instance.__dict__.pop('_stored_files', []), storage.file_names(instance))
+
+@receiver(post_delete, sender=Gallery)
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=Representative)
+def release_stored_files(sender, instance, **kwargs):
+    storage.release(storage.file_names(instance))
+
+
+# Resized variants of uploaded images, built once per new file.
+
+@receiver(post_save, sender=Photo)
+@receiver(post_save, sender=Gallery)
+@receiver(post_save, sender=Representative)
+def queue_renditions(sender, instance, raw=False, **kwargs):
+    # Only marks them pending; `manage.py process_media` builds them and the
+    # original is served until then
+    if not raw:
+        renditions.queue(instance)
+
+
+@receiver(post_save, sender=Gallery)
+def queue_media_processing(sender, instance, raw=False, **kwargs):
+    # Only queues a MediaJob; `manage.py process_media` does the encoding
+    if not raw:
+        media.enqueue(instance)
+
+
+# Content versioning: keep the ContentVersion counters in step with what players show.
+
+@receiver(post_save, sender=Gallery)
+@receiver(post_save, sender=Photo)
+@receiver(post_save, sender=CitizenCharter)
+@receiver(post_save, sender=TickerMessage)
+@receiver(post_save, sender=Representative)
+@receiver(post_delete, sender=Gallery)
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=CitizenCharter)
+@receiver(post_delete, sender=TickerMessage)
+@receiver(post_delete, sender=Representative)
+def version_shared_content(sender, instance, **kwargs):
+    # Shown on every screen
+    versioning.bump_content(sender)
+
+def is_emergency(notice):
+    return notice.status == 'published' and notice.priority == 'emergency'
+
+@receiver(post_save, sender=Notice)
+def version_notice_save(sender, instance, **kwargs):
+    versioning.bump_content(Notice, list(instance.target_devices.values_list('pk', flat=True)),
+                            emergency=is_emergency(instance))
+
+@receiver(pre_delete, sender=Notice)
+def capture_notice_devices(sender, instance, **kwargs):
+    # The target_devices rows are gone by post_delete
+    instance._versioned_device_ids = list(instance.target_devices.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Notice)
+def version_notice_delete(sender, instance, **kwargs):
+    versioning.bump_content(Notice, getattr(instance, '_versioned_device_ids', None))
+
+@receiver(m2m_changed, sender=Notice.target_devices.through)
+def version_notice_targets(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # pk_set is not provided for clears, remember who loses the notices
+        if reverse:
+            instance._versioned_targets = [instance.pk]
+        else:
+            instance._versioned_targets = list(instance.target_devices.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        versioning.bump_content(Notice, getattr(instance, '_versioned_targets', None))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        # Forward: pk_set holds devices. Reverse (device.notice_set): it holds notices.
+        if reverse:
+            versioning.bump_content(Notice, [instance.pk])
+        else:
+            versioning.bump_content(Notice, pk_set, emergency=action == 'post_add' and is_emergency(instance))
+
+@receiver(pre_save, sender=Device)
+def remember_device_name(sender, instance, **kwargs):
+    if instance.pk:
+        instance._stored_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+@receiver(post_save, sender=Device)
+def version_device_create(sender, instance, created, **kwargs):
+    # The playlist carries the device name; other edits (heartbeats included) do not change it
+    if created or instance.__dict__.pop('_stored_name', instance.name) != instance.name:
+        versioning.bump(versioning.device_key(instance.pk))
+
+@receiver(post_delete, sender=Device)
+def version_device_delete(sender, instance, **kwargs):
+    ContentVersion.objects.filter(key=versioning.device_key(instance.pk)).delete()
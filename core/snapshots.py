@@ -0,0 +1,117 @@
+"""
+Pre-rendered player payloads.
+
+A device's build_playlist() output is rendered to JSON once per content
+change and kept in SNAPSHOT_DIR, compressed in every available encoding
+(core/compression.py), under a name derived from the device's content
+stamp and the day (notice expiry is date based). Player polls are
+answered from those files: one stamp lookup, no ORM queries for the
+content, no serializers, no DRF request handling and no compression.
+
+Whichever worker sees a new stamp first builds the file, and removes the
+device's older ones; the others and every later poll reuse it. A poll
+whose file was removed under it is answered by the viewset. `manage.py rebuild_snapshots` prebuilds all of
+them, e.g. after a deploy. Devices without a ContentVersion row (bulk
+inserted, never versioned) have nothing to key a snapshot on and are
+served live.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import compression
+from .models import Device
+from .playlist import build_playlist
+from .versioning import device_stamp, adevice_stamp
+
+
+# The gzip file is always written; clients that accept no encoding get it decompressed
+SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+
+def _path(device_id, stamp):
+    """The snapshot's name without the encoding suffix."""
+    key = f'{stamp.tag}|{stamp.last_modified.isoformat()}|{timezone.now().date()}'
+    return os.path.join(settings.SNAPSHOT_DIR, f'device-{device_id}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.json')
+
+
+def path(base, encoding):
+    return base + SUFFIXES[encoding]
+
+
+def render(device):
+    """The playlist as the JSON bytes the API would send (media URLs stay relative)."""
+    return JSONRenderer().render(build_playlist(device))
+
+
+def build(device, stamp=None):
+    """Write the device's snapshot for stamp (default: its current one) and drop older ones."""
+    stamp = stamp or device_stamp(device.pk)
+    base = _path(device.pk, stamp)
+    body = render(device)
+    os.makedirs(settings.SNAPSHOT_DIR, exist_ok=True)
+    written = []
+    for encoding in compression.ENCODINGS:
+        # Written aside and renamed, so readers never see half a file
+        with tempfile.NamedTemporaryFile(dir=settings.SNAPSHOT_DIR, prefix='.build-', delete=False) as f:
+            f.write(compression.compress(body, encoding, stored=True))
+        os.replace(f.name, path(base, encoding))
+        written.append(path(base, encoding))
+    for stale in glob.glob(os.path.join(settings.SNAPSHOT_DIR, f'device-{device.pk}-*')):
+        if stale not in written:
+            _remove(stale)
+    return base
+
+
+def current(device_id):
+    """
+    (name, stamp) of the device's up-to-date snapshot, built if missing;
+    path(name, encoding) locates each file. None when the device is
+    unversioned; raises Device.DoesNotExist.
+    """
+    stamp = device_stamp(device_id)
+    if stamp.last_modified is None:
+        return None
+    base = _path(device_id, stamp)
+    if not _built(base):
+        build(Device.objects.get(pk=device_id), stamp)
+    return base, stamp
+
+
+async def acurrent(device_id):
+    """current() for async views; a missing snapshot is built in a worker thread."""
+    stamp = await adevice_stamp(device_id)
+    if stamp.last_modified is None:
+        return None
+    base = _path(device_id, stamp)
+    if not _built(base):
+        await sync_to_async(build)(await Device.objects.aget(pk=device_id), stamp)
+    return base, stamp
+
+
+def _built(base):
+    return all(os.path.exists(path(base, encoding)) for encoding in compression.ENCODINGS)
+
+
+def prune(device_ids):
+    """Delete the snapshots of devices that are not in device_ids."""
+    keep = {str(pk) for pk in device_ids}
+    removed = 0
+    for path in glob.glob(os.path.join(settings.SNAPSHOT_DIR, 'device-*-*')):
+        if os.path.basename(path).split('-')[1] not in keep:
+            removed += _remove(path)
+    return removed
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0  # another worker got there first
@@ -0,0 +1,101 @@
+"""
+Content-addressed storage for uploads.
+
+Every file is stored once, under the SHA-256 of its bytes
+(cas/ab/<sha256>.<ext>), whatever model or upload_to it came from. The
+same poster uploaded to several galleries and representatives costs no
+extra disk, and since a stored name can never change content its URL can
+be cached forever.
+
+MediaBlob rows count the model fields that point at each file. The
+signals in signals.py keep the counts current on save and delete, code
+that writes file fields with update() calls retain()/release() itself,
+and `manage.py prune_media` removes files nothing points at any more.
+Files stored before this backend (no MediaBlob row) are never counted or
+pruned.
+"""
+import hashlib
+import os
+from collections import Counter, defaultdict
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+PREFIX = 'cas/'
+
+
+def blob_name(digest, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return f'{PREFIX}{digest[:2]}/{digest}{extension}'
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        from .models import MediaBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        sha = hashlib.sha256()
+        for chunk in content.chunks():
+            sha.update(chunk)
+        name = blob_name(sha.hexdigest(), name)
+        # The row comes before the file. An unreferenced blob starts its grace
+        # period again, so prune_media (which deletes row and file in one
+        # transaction) either keeps it or has finished, and the file is
+        # written again below; the reference itself is only counted post_save.
+        with transaction.atomic():
+            MediaBlob.objects.filter(name=name, refcount=0).update(released_at=timezone.now())
+            MediaBlob.objects.get_or_create(name=name, defaults={'size': content.size})
+        if not self.exists(name):
+            name = self._save(name, content)
+        return name
+
+
+def file_fields(model):
+    return [f for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+
+
+def file_names(instance):
+    """Names of the files instance's file fields point at."""
+    return [getattr(instance, f.attname).name for f in file_fields(type(instance)) if getattr(instance, f.attname)]
+
+
+def _adjust(names, delta):
+    from .models import MediaBlob
+
+    # Group by step so a file referenced twice moves by two in one UPDATE
+    steps = defaultdict(list)
+    for name, count in Counter(n for n in names if is_content_addressed(n)).items():
+        steps[count * delta].append(name)
+    for step, group in steps.items():
+        blobs = MediaBlob.objects.filter(name__in=group)
+        if step > 0:
+            blobs.update(refcount=F('refcount') + step, released_at=None)
+        else:
+            blobs.update(refcount=Greatest(F('refcount') + step, 0))
+            blobs.filter(refcount=0, released_at__isnull=True).update(released_at=timezone.now())
+
+
+def retain(names):
+    _adjust(names, 1)
+
+
+def release(names):
+    _adjust(names, -1)
+
+
+def sync(before, after):
+    """Move the counts from the file names a row had to the ones it has now."""
+    before, after = Counter(before), Counter(after)
+    retain(list((after - before).elements()))
+    release(list((before - after).elements()))
@@ -0,0 +1,11 @@
+from django import template
+
+from core import renditions
+
+register = template.Library()
+
+
+@register.filter
+def rendition(record, width):
+    """URL of the smallest stored variant at least `width` pixels wide, or '' if there is none"""
+    return renditions.pick(record, int(width)) or ''
@@ -1,10 +1,58 @@
-from django.test import TestCase, Client
-from django.urls import reverse
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase, AsyncClient, Client, RequestFactory,
+                         override_settings)
+from unittest import mock, skipUnless
+from django.urls import include, path, reverse, URLResolver
 from django.contrib.auth import get_user_model
-from core.models import Notice
+from django.utils import timezone
+from core.models import (Notice, Device, TickerMessage, CitizenCharter, ContentVersion, OutboxEvent, AuditLog,
+                         Gallery, Photo, Representative, Contact, ActionRequest, MediaJob, MediaBlob)
+from core import (versioning, events, outbox, audit, media, content_cache, compression, snapshots, views,
+                  renditions)
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from core.management.commands.import_sqlite import keep_timestamps, sqlite_connection
+from core.pagination import ContentCursorPagination
+from core.playlist import published_notices
+from core.urls import async_urlpatterns
+from core.asgi import with_player_events
+from django.core.signals import request_finished
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test.utils import CaptureQueriesContext
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from asgiref.sync import sync_to_async
+from datetime import datetime, timedelta
+from PIL import Image
+import asyncio
+import gzip
+import json
+import os
+import re
+import runpy
+import shutil
+import tempfile
+import threading
+import time
 
 User = get_user_model()
 
+
+def close_stream(response):
+    """
+    Close a streaming response that was not read to the end. Keeps the test's
+    database connection: request_finished would otherwise close it, which
+    ends the test transaction on servers such as PostgreSQL.
+    """
+    request_finished.disconnect(close_old_connections)
+    try:
+        response.close()
+    finally:
+        request_finished.connect(close_old_connections)
+
 class DashboardTest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -27,3 +75,1438 @@ class HealthCheckTest(TestCase):
         # It might be a redirect to login or a public page
         self.assertIn(response.status_code, [200, 302])
 
+
+class NepaliDateApiTest(TestCase):
+    def test_default_mode(self):
+        response = self.client.get(reverse('nepali_date'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('date', response.json())
+        self.assertIn('time', response.json())
+
+    def test_calendar_mode(self):
+        response = self.client.get(reverse('nepali_date'), {'mode': 'calendar'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['mode'], 'calendar')
+        self.assertEqual(len(data['weekdays']), 7)
+        self.assertEqual(data['weekdays'][0], 'आइतबार')
+        year = str(data['anchor']['bs']['year'])
+        self.assertEqual(len(data['month_days'][year]), 12)
+        self.assertIn(sum(data['month_days'][year]), (365, 366))
+        self.assertEqual(data['utc_offset_minutes'], 345)
+
+
+class PlaylistApiTest(TestCase):
+    def setUp(self):
+        self.lobby = Device.objects.create(name='Lobby', location_description='Ground floor')
+        self.office = Device.objects.create(name='Office', location_description='First floor')
+        self.notice = Notice.objects.create(title='Lobby only', content='...', status='published',
+                                            published_date=timezone.now())
+        self.notice.target_devices.add(self.lobby)
+        Notice.objects.create(title='Draft', content='...', status='draft')
+        TickerMessage.objects.create(content='Welcome')
+
+    def test_notices_filtered_by_device(self):
+        response = self.client.get(reverse('device-playlist', args=[self.lobby.pk]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([n['id'] for n in data['notices']], [self.notice.pk])
+        self.assertEqual(len(data['ticker']), 1)
+        for key in ('charters', 'galleries', 'representatives'):
+            self.assertIn(key, data)
+
+        response = self.client.get(reverse('device-playlist', args=[self.office.pk]))
+        self.assertEqual(response.json()['notices'], [])
+
+    def test_unknown_device(self):
+        response = self.client.get(reverse('device-playlist', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalApiTest(TestCase):
+    def setUp(self):
+        CitizenCharter.objects.create(service_name='Birth registration', required_docs='Form',
+                                      service_time='1 day', service_fee='Free', responsible_officer='Ward')
+
+    def test_unchanged_poll_returns_304(self):
+        url = reverse('citizencharter-list')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+        self.assertTrue(first.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_change_invalidates_etag(self):
+        url = reverse('tickermessage-list')
+        first = self.client.get(url)
+        TickerMessage.objects.create(content='New message')
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_published_notices_conditional(self):
+        url = reverse('notice-published')
+        first = self.client.get(url)
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+
+class ContentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        content_cache.stats.reset()
+        CitizenCharter.objects.create(service_name='Birth registration', required_docs='Form',
+                                      service_time='1 day', service_fee='Free', responsible_officer='Ward')
+
+    def test_repeat_reads_skip_the_database(self):
+        url = reverse('citizencharter-list')
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(1):  # the stamp lookup only
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(content_cache.stats.snapshot(), {'hits': 1, 'misses': 1, 'stores': 1, 'hit_rate': 50.0})
+
+    def test_saves_and_deletes_invalidate(self):
+        url = reverse('citizencharter-list')
+        self.client.get(url)
+        charter = CitizenCharter.objects.create(service_name='Migration', required_docs='Form',
+                                                service_time='1 day', service_fee='Free', responsible_officer='Ward')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Migration')
+        charter.delete()
+        self.assertNotContains(self.client.get(url), 'Migration')
+
+    def test_published_notices_and_representatives(self):
+        user = User.objects.create_user(username='editor', password='password')
+        Notice.objects.create(title='Holiday', content='Closed', status='published', created_by=user)
+        url = reverse('notice-published')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        Notice.objects.create(title='Camp', content='Health camp', status='published', created_by=user)
+        self.assertContains(self.client.get(url), 'Camp')
+        rep = Representative.objects.create(full_name='Ram', designation='अन्य')
+        detail = reverse('representative-detail', args=[rep.pk])
+        self.client.get(detail)
+        self.assertEqual(self.client.get(detail)['X-Cache'], 'HIT')
+
+    def test_file_based_backend(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        with self.settings(CACHES=backend):
+            url = reverse('tickermessage-list')
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+            self.assertTrue(os.listdir(location))
+
+    def test_uncached_actions_and_formats(self):
+        self.client.get(reverse('gallery-list'))
+        self.assertFalse(self.client.get(reverse('gallery-list')).has_header('X-Cache'))
+        url = reverse('citizencharter-list') + '?format=api'
+        self.client.get(url)
+        self.assertFalse(self.client.get(url).has_header('X-Cache'))
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = self.settings(SNAPSHOT_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory
+        self.device = Device.objects.create(name='Lobby', location_description='Ground floor')
+        notice = Notice.objects.create(title='Holiday', content='Closed', status='published')
+        notice.target_devices.add(self.device)
+        TickerMessage.objects.create(content='Welcome')
+        self.url = reverse('device_playlist', args=[self.device.pk])
+
+    def test_snapshot_matches_the_live_payload(self):
+        from core.views import playlist_view
+        live = json.loads(playlist_view(RequestFactory().get(self.url), pk=self.device.pk).render().content)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        snapshot = response.json()
+        for payload in (live, snapshot):
+            payload.pop('generated_at')  # build time
+        self.assertEqual(snapshot, live)
+        self.assertEqual([n['title'] for n in response.json()['notices']], ['Holiday'])
+
+    def test_warm_poll_is_one_query(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):  # the stamp lookup only
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_gzip_is_sent_as_is(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content))['ticker'][0]['content'], 'Welcome')
+
+    def test_content_changes_rebuild(self):
+        self.client.get(self.url)
+        TickerMessage.objects.create(content='Camp tomorrow')
+        ticker = [t['content'] for t in self.client.get(self.url).json()['ticker']]
+        self.assertIn('Camp tomorrow', ticker)
+        self.assertEqual(len(os.listdir(self.directory)), len(compression.ENCODINGS))  # the old snapshot is gone
+
+    def test_snapshot_removed_by_another_worker(self):
+        name, stamp = snapshots.current(self.device.pk)
+        for encoding in compression.ENCODINGS:
+            os.remove(snapshots.path(name, encoding))  # a newer build cleaned up after current() returned
+        with mock.patch('core.snapshots.current', return_value=(name, stamp)):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([n['title'] for n in response.json()['notices']], ['Holiday'])
+
+    def test_unknown_device_and_browsable_api(self):
+        self.assertEqual(self.client.get(reverse('device_playlist', args=[999])).status_code, 404)
+        response = self.client.get(self.url + '?format=api')
+        self.assertContains(response, 'Holiday')
+        self.assertFalse(os.listdir(self.directory))
+
+    def test_rebuild_command(self):
+        open(os.path.join(self.directory, 'device-999-0123456789abcdef.json.gz'), 'wb').close()
+        out = StringIO()
+        call_command('rebuild_snapshots', stdout=out)
+        self.assertIn('Built 1 snapshots', out.getvalue())
+        name = snapshots.current(self.device.pk)[0]
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         sorted(os.path.basename(snapshots.path(name, e)) for e in compression.ENCODINGS))
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(20):
+            CitizenCharter.objects.create(service_name=f'जन्म दर्ता {i}', required_docs='नागरिकता प्रमाणपत्रको प्रतिलिपि',
+                                          service_time='१ दिन', service_fee='निःशुल्क', responsible_officer='वडा सचिव')
+
+    def test_negotiation(self):
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+        self.assertIsNone(compression.negotiate('gzip;q=0, identity'))
+        self.assertIsNone(compression.negotiate(''))
+        self.assertEqual(compression.negotiate('*', ('gzip',)), 'gzip')
+        self.assertEqual(compression.negotiate('br, gzip', ('gzip',)), 'gzip')
+
+    def test_api_json_is_compressed(self):
+        url = reverse('citizencharter-list')
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['X-Cache'], 'HIT')  # served from the precompressed entry
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        self.assertLess(len(response.content), len(plain.content) / 5)
+        revalidated = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_uncached_responses_are_compressed_on_the_fly(self):
+        response = self.client.get(reverse('gallery-list') + '?format=json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))  # too small to bother
+        response = self.client.get(reverse('citizencharter-list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 20)
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli_for_json_but_not_pages(self):
+        response = self.client.get(reverse('citizencharter-list'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(compression.brotli.decompress(response.content))['results']), 20)
+        self.client.force_login(User.objects.create_superuser(username='admin', password='password'))
+        page = self.client.get(reverse('charter_list'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(page['Content-Encoding'], 'gzip')  # CSRF tokens: padded gzip only
+        self.assertIn('जन्म दर्ता'.encode(), gzip.decompress(page.content))
+
+    def test_streams_and_encoded_responses_pass_through(self):
+        device = Device.objects.create(name='Lobby', location_description='Ground floor')
+        with self.settings(PLAYER_EVENTS_ENABLED=True):
+            response = self.client.get(reverse('device_events', args=[device.pk]), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        close_stream(response)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.settings(SNAPSHOT_DIR=directory):
+            response = self.client.get(reverse('device_playlist', args=[device.pk]), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['charters']), 20)
+
+
+class ContentVersionTest(TestCase):
+    def setUp(self):
+        self.lobby = Device.objects.create(name='Lobby', location_description='Ground floor')
+        self.office = Device.objects.create(name='Office', location_description='First floor')
+
+    def version(self, key):
+        return ContentVersion.objects.get(pk=key).version
+
+    def test_shared_content_bumps_every_device(self):
+        lobby, office = self.version('device:%d' % self.lobby.pk), self.version('device:%d' % self.office.pk)
+        TickerMessage.objects.create(content='Hello')
+        self.assertEqual(self.version('core.tickermessage'), 1)
+        self.assertEqual(self.version('device:%d' % self.lobby.pk), lobby + 1)
+        self.assertEqual(self.version('device:%d' % self.office.pk), office + 1)
+
+    def test_notice_targets_bump_only_their_devices(self):
+        notice = Notice.objects.create(title='T', content='C', status='published')
+        office = self.version('device:%d' % self.office.pk)
+        lobby = self.version('device:%d' % self.lobby.pk)
+        notice.target_devices.add(self.lobby)
+        self.assertEqual(self.version('device:%d' % self.lobby.pk), lobby + 1)
+        self.assertEqual(self.version('device:%d' % self.office.pk), office)
+
+        notice.target_devices.clear()
+        self.assertEqual(self.version('device:%d' % self.lobby.pk), lobby + 2)
+
+    def test_heartbeat_does_not_bump(self):
+        before = self.version('device:%d' % self.lobby.pk)
+        self.lobby.last_seen = timezone.now()
+        self.lobby.save()
+        self.assertEqual(self.version('device:%d' % self.lobby.pk), before)
+
+    def test_device_stamp_is_one_query(self):
+        with self.assertNumQueries(1):
+            versioning.device_stamp(self.lobby.pk)
+
+
+class DeviceEventsTest(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(name='Lobby', location_description='Ground floor')
+
+    def stream(self):
+        return events.device_event_stream(self.device.pk, lifetime=2, marker_interval=0.01,
+                                          db_poll_interval=0.01)
+
+    def test_disabled_returns_204(self):
+        with self.settings(PLAYER_EVENTS_ENABLED=False):
+            response = self.client.get(reverse('device_events', args=[self.device.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    def test_enabled_streams(self):
+        with self.settings(PLAYER_EVENTS_ENABLED=True):
+            response = self.client.get(reverse('device_events', args=[self.device.pk]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(next(iter(response.streaming_content)).startswith(b'retry:'))
+        close_stream(response)
+
+    def test_change_is_pushed(self):
+        stream = self.stream()
+        self.assertTrue(next(stream).startswith('retry:'))
+        TickerMessage.objects.create(content='Breaking')
+        frame = next(stream)
+        self.assertTrue(frame.startswith('event: change'))
+        self.assertIn('"ticker"', frame)
+
+    def test_emergency_notice_flagged(self):
+        stream = self.stream()
+        next(stream)
+        with self.captureOnCommitCallbacks(execute=True):
+            notice = Notice.objects.create(title='Flood', content='Evacuate', status='published',
+                                           priority='emergency')
+            notice.target_devices.add(self.device)
+        frame = next(stream)
+        self.assertIn('"notices"', frame)
+        self.assertIn('"emergency": true', frame)
+
+
+# The URLconf an ASGI server gets (PLAYER_ASYNC_VIEWS), for the async view tests
+urlpatterns = async_urlpatterns + [path('', include('DigitalSignage.urls'))]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncPlayerViewsTest(TestCase):
+    client_class = AsyncClient
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = self.settings(SNAPSHOT_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.device = Device.objects.create(name='Lobby', location_description='Ground floor')
+        notice = Notice.objects.create(title='Holiday', content='Closed', status='published',
+                                       published_date=timezone.now())
+        notice.target_devices.add(self.device)
+        Notice.objects.create(title='Draft', content='...', status='draft')
+        TickerMessage.objects.create(content='Welcome', order=1)
+        TickerMessage.objects.create(content='Camp', order=2)
+
+    def sync_body(self, view, url, **kwargs):
+        cache.clear()  # the async views share the viewsets' cache entries
+        return json.loads(view(RequestFactory().get(url), **kwargs).render().content)
+
+    async def test_published_matches_the_viewset(self):
+        url = reverse('notice-published')
+        response = await self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        expected = await sync_to_async(self.sync_body)(views.published_view, url)
+        self.assertEqual(response.json(), expected)
+        self.assertEqual([n['title'] for n in response.json()], ['Holiday'])
+        fields = await self.client.get(url, {'fields': 'id,title'})
+        self.assertEqual(set(fields.json()[0]), {'id', 'title'})
+
+    def test_unchanged_polls_are_one_query(self):
+        client = Client()  # assertNumQueries needs a sync test; the views still run async
+        for url in (reverse('notice-published'), reverse('tickermessage-list'),
+                    reverse('device_playlist', args=[self.device.pk])):
+            etag = client.get(url)['ETag']
+            with self.assertNumQueries(1):  # the stamp lookup
+                self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    async def test_ticker_page(self):
+        url = reverse('tickermessage-list')
+        response = await self.client.get(url, {'page_size': 500})
+        self.assertEqual(response.json(), await sync_to_async(self.sync_body)(views.ticker_list_view,
+                                                                               url + '?page_size=500'))
+        self.assertEqual([t['content'] for t in response.json()['results']], ['Welcome', 'Camp'])
+
+        # More than a page: the viewset builds the cursor links
+        first = (await self.client.get(url, {'page_size': 1})).json()
+        self.assertEqual([t['content'] for t in first['results']], ['Welcome'])
+        second = (await self.client.get(first['next'])).json()
+        self.assertEqual([t['content'] for t in second['results']], ['Camp'])
+
+    async def test_playlist_snapshot(self):
+        url = reverse('device_playlist', args=[self.device.pk])
+        response = await self.client.get(url)
+        self.assertEqual([n['title'] for n in response.json()['notices']], ['Holiday'])
+        second = await self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual((await self.client.get(reverse('device_playlist', args=[999]))).status_code, 404)
+
+    async def test_playlist_snapshot_removed_by_another_worker(self):
+        name, stamp = await sync_to_async(snapshots.current)(self.device.pk)
+        for encoding in compression.ENCODINGS:
+            os.remove(snapshots.path(name, encoding))
+        with mock.patch('core.snapshots.acurrent', return_value=(name, stamp)):
+            response = await self.client.get(reverse('device_playlist', args=[self.device.pk]))
+        self.assertEqual([n['title'] for n in response.json()['notices']], ['Holiday'])
+
+    async def test_nepali_date_and_browsable_api(self):
+        response = await self.client.get(reverse('nepali_date'), {'mode': 'calendar'})
+        self.assertEqual(response.json()['mode'], 'calendar')
+        self.assertIn('date', (await self.client.get(reverse('nepali_date'))).json())
+        browsable = await self.client.get(reverse('notice-published'), {'format': 'api'})
+        self.assertContains(browsable, 'Holiday')
+
+@override_settings(PLAYER_EVENTS_ENABLED=True)
+class AsyncEventStreamTest(TransactionTestCase):
+    # Streams read on pool threads, which only see committed rows
+
+    def setUp(self):
+        self.device = Device.objects.create(name='Lobby', location_description='Ground floor')
+
+    async def test_event_stream(self):
+        stream = events.adevice_event_stream(self.device.pk, lifetime=2, db_poll_interval=0.01)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        await TickerMessage.objects.acreate(content='Breaking')
+        frame = await anext(stream)
+        self.assertTrue(frame.startswith('event: change'))
+        self.assertIn('"ticker"', frame)
+        await stream.aclose()
+
+    async def test_watcher_wakes_streams(self):
+        streams = [events.adevice_event_stream(self.device.pk, lifetime=5, db_poll_interval=60)
+                   for _ in range(3)]
+        for stream in streams:
+            await anext(stream)
+        frames = asyncio.gather(*(anext(stream) for stream in streams))
+        await asyncio.sleep(0.1)  # all three waiting on the watcher
+        await TickerMessage.objects.acreate(content='Breaking')
+        events.broker.publish('ticker')  # what the commit of the save does
+        started = time.monotonic()
+        for frame in await frames:
+            self.assertIn('"ticker"', frame)
+        self.assertLess(time.monotonic() - started, 2)
+        for stream in streams:
+            await stream.aclose()
+
+    async def call(self, path, disconnect_after=1, headers=()):
+        """Run the ASGI application for a GET of path; the messages it sent and the scopes Django got."""
+        sent, passed, disconnected = [], [], asyncio.Event()
+
+        async def django_application(scope, receive, send):
+            passed.append(scope['path'])
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if len([m for m in sent if m.get('more_body')]) >= disconnect_after:
+                disconnected.set()
+        application = with_player_events(django_application)
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': [(b'host', b'testserver'), *headers]}
+        await asyncio.wait_for(application(scope, receive, send), 5)
+        return sent, passed
+
+    async def test_asgi_stream_ends_when_the_client_goes(self):
+        sent, passed = await self.call(reverse('device_events', args=[self.device.pk]))
+        self.assertEqual(passed, [])
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        self.assertTrue(sent[1]['body'].startswith(b'retry:'))
+        self.assertEqual(len(sent), 2)
+
+    async def test_asgi_disabled_unknown_and_other_paths(self):
+        with self.settings(PLAYER_EVENTS_ENABLED=False):
+            sent, _ = await self.call(reverse('device_events', args=[self.device.pk]))
+        self.assertEqual(sent[0]['status'], 204)
+        sent, _ = await self.call(reverse('device_events', args=[999]))
+        self.assertEqual(sent[0]['status'], 404)
+        sent, passed = await self.call(reverse('device_playlist', args=[self.device.pk]))
+        self.assertEqual((sent, passed), ([], [reverse('device_playlist', args=[self.device.pk])]))
+
+    async def test_asgi_stream_has_cors_headers_and_checks_the_host(self):
+        sent, _ = await self.call(reverse('device_events', args=[self.device.pk]),
+                                  headers=[(b'origin', b'http://player.example')])
+        self.assertIn((b'access-control-allow-origin', b'*'), sent[0]['headers'])
+        self.assertIn((b'x-content-type-options', b'nosniff'), sent[0]['headers'])
+        with self.settings(ALLOWED_HOSTS=['signage.example']):
+            sent, _ = await self.call(reverse('device_events', args=[self.device.pk]))
+        self.assertEqual(sent[0]['status'], 400)
+
+
+class AsyncAuditRequestTest(TransactionTestCase):
+    # A sync view behind the async middleware chain, as under ASGI
+    client_class = AsyncClient
+
+    async def test_sync_view_entries_are_buffered_with_the_user(self):
+        admin = await User.objects.acreate(username='admin', is_staff=True, is_superuser=True)
+        await self.client.aforce_login(admin)
+        response = await self.client.post(reverse('device_create'), {
+            'name': 'Gate', 'location_description': 'Entrance', 'is_active': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        entry = await AuditLog.objects.select_related('user').aget(model_name=Device._meta.verbose_name)
+        self.assertEqual(entry.user, admin)
+
+
+class HeartbeatTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='player', password='password')
+        self.client.force_login(self.user)
+        self.device = Device.objects.create(name='Lobby', location_description='Ground floor')
+        self.url = reverse('device-heartbeat', args=[self.device.pk])
+
+    def test_updates_last_seen_and_telemetry(self):
+        response = self.client.post(self.url, {'uptime': 120, 'current_item': 'notice:4', 'fps': 30},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.device.refresh_from_db()
+        self.assertIsNotNone(self.device.last_seen)
+        self.assertEqual(self.device.telemetry, {'uptime': 120, 'current_item': 'notice:4', 'fps': 30.0})
+
+    def test_single_update_without_side_effects(self):
+        versions = dict(ContentVersion.objects.values_list('key', 'version'))
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200)
+        writes = [q['sql'] for q in queries if not q['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE "core_device"'))
+        self.assertFalse(AuditLog.objects.filter(model_name=Device._meta.verbose_name, action='Updated').exists())
+        self.assertEqual(dict(ContentVersion.objects.values_list('key', 'version')), versions)
+
+    def test_invalid_telemetry_rejected(self):
+        response = self.client.post(self.url, {'uptime': -1}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_device(self):
+        response = self.client.post(reverse('device-heartbeat', args=[self.device.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkHeartbeatTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='gateway', password='password'))
+        self.devices = [Device.objects.create(name=f'Screen {i}', location_description='Hall') for i in range(3)]
+        self.url = reverse('device-heartbeats')
+
+    def post(self, devices):
+        return self.client.post(self.url, {'devices': devices}, content_type='application/json')
+
+    def test_applies_all_heartbeats(self):
+        a, b, c = self.devices
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post([{'id': a.pk, 'uptime': 10}, {'id': b.pk}, {'id': c.pk, 'fps': 25}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 3)
+        updates = [q for q in queries if q['sql'].startswith('UPDATE "core_device"')]
+        self.assertEqual(len(updates), 2)  # last_seen for all, telemetry for the reporting ones
+        self.assertEqual(Device.objects.filter(last_seen__isnull=False).count(), 3)
+        a.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual(a.telemetry, {'uptime': 10})
+        self.assertEqual(b.telemetry, {})
+        self.assertFalse(AuditLog.objects.filter(model_name=Device._meta.verbose_name, action='Updated').exists())
+
+    def test_reports_unknown_ids(self):
+        missing = self.devices[-1].pk + 100
+        response = self.post([{'id': self.devices[0].pk}, {'id': missing}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(response.json()['unknown'], [missing])
+
+    def test_rejects_empty_and_invalid(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([{'id': self.devices[0].pk, 'fps': -1}]).status_code, 400)
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        self.assertIn(self.post([{'id': self.devices[0].pk}]).status_code, (401, 403))
+
+
+class PaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='editor', password='password')
+        for i in range(5):
+            Notice.objects.create(title=f'Notice {i}', content='Body', status='published')
+
+    def test_cursor_pages_cover_the_table(self):
+        url, titles = reverse('notice-list') + '?page_size=2', []
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 2)
+            titles += [n['title'] for n in data['results']]
+            url = data['next']
+        self.assertEqual(titles, [f'Notice {i}' for i in reversed(range(5))])
+
+    def test_page_size_is_capped(self):
+        cap = ContentCursorPagination.max_page_size
+        Notice.objects.bulk_create(Notice(title=f'Bulk {i}', content='Body') for i in range(cap))
+        response = self.client.get(reverse('notice-list'), {'page_size': 10000})
+        self.assertEqual(len(response.json()['results']), cap)
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_ties_on_the_leading_column_page_without_offsets(self):
+        # Every message at order 0 and the same timestamp: only pk tells them apart
+        TickerMessage.objects.bulk_create(TickerMessage(content=f'Message {i}') for i in range(7))
+        TickerMessage.objects.update(created_at=timezone.now())
+        expected = list(TickerMessage.objects.order_by('pk').values_list('content', flat=True))
+        url, pages = reverse('tickermessage-list') + '?page_size=2', []
+        with mock.patch.object(ContentCursorPagination, 'offset_cutoff', 0):
+            while url:
+                data = self.client.get(url).json()
+                pages.append(data)
+                url = data['next']
+            self.assertEqual([t['content'] for page in pages for t in page['results']], expected)
+            back = self.client.get(pages[-1]['previous']).json()
+        self.assertEqual(back['results'], pages[-2]['results'])
+
+    def test_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('notice-list'), {'fields': 'id,title'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title'})
+        select = next(q['sql'] for q in queries if 'FROM "core_notice"' in q['sql'])
+        self.assertNotIn('"content"', select)
+
+    def test_sparse_fields_ignored_on_writes(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('tickermessage-list') + '?fields=id',
+                                    {'content': 'Office closed', 'is_active': True})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['content'], 'Office closed')
+
+
+def image_upload(name, size=(2000, 1000), fmt='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class TempMediaMixin:
+    """Uploads and renditions go to a throwaway MEDIA_ROOT."""
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        storages = {
+            'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            'renditions': {'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                           'OPTIONS': {'location': f'{media}/renditions', 'base_url': '/media/renditions/'}},
+        }
+        override = self.settings(MEDIA_ROOT=media, STORAGES=storages)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media = media
+
+
+def built(instance):
+    """instance after the media worker has built its queued renditions."""
+    renditions.build_pending()
+    instance.refresh_from_db()
+    return instance
+
+
+class RenditionTest(TempMediaMixin, TestCase):
+    def test_upload_only_queues_variants(self):
+        with mock.patch('core.renditions._encode') as encode:
+            rep = Representative.objects.create(full_name='Ram', designation='अन्य', photo=image_upload('ram.jpg'))
+        encode.assert_not_called()
+        rep.refresh_from_db()
+        self.assertEqual(rep.photo_renditions, {'source': rep.photo.name, 'pending': True})
+        data = self.client.get(reverse('representative-detail', args=[rep.pk])).json()
+        self.assertEqual(data['photo_renditions'], [])  # the player falls back to the original
+
+    def test_variants_built_by_the_worker(self):
+        rep = Representative.objects.create(full_name='Ram', designation='अन्य', photo=image_upload('ram.jpg'))
+        version = ContentVersion.objects.get(pk=versioning.model_key(Representative)).version
+        call_command('process_media', '--once', stdout=StringIO())
+        self.assertEqual(ContentVersion.objects.get(pk=versioning.model_key(Representative)).version, version + 1)
+        record = built(rep).photo_renditions
+        self.assertEqual([v['width'] for v in record['variants']], [480, 1280, 1920, 2000])
+        self.assertEqual(record['variants'][0]['height'], 240)
+        for variant in record['variants']:
+            self.assertTrue(os.path.exists(os.path.join(self.media, 'renditions', variant['webp'])))
+            self.assertIn(record['hash'], variant['jpeg'])
+        self.assertFalse(renditions.build_pending())
+
+    def test_resave_and_same_content_reuse_files(self):
+        first = built(Gallery.objects.create(title='Fair', cover_image=image_upload('fair.jpg', (800, 600))))
+        with mock.patch('core.renditions._encode') as encode:
+            first.title = 'Fair 2081'
+            first.save()
+            second = built(Gallery.objects.create(title='Copy', cover_image=image_upload('copy.jpg', (800, 600))))
+        encode.assert_not_called()
+        self.assertEqual(second.cover_renditions['variants'], built(first).cover_renditions['variants'])
+
+    def test_video_cover_has_no_variants(self):
+        gallery = Gallery.objects.create(title='Clip', cover_image=SimpleUploadedFile('clip.mp4', b'\x00' * 64))
+        self.assertEqual(built(gallery).cover_renditions['variants'], [])
+
+    def test_encoding_errors_leave_the_original(self):
+        gallery = Gallery.objects.create(title='Pano', cover_image=image_upload('pano.jpg', (800, 600)))
+        with mock.patch('core.renditions._encode', side_effect=OSError('broken data stream')):
+            record = built(gallery).cover_renditions
+        self.assertEqual((record['variants'], record['error']), ([], 'broken data stream'))
+        self.assertFalse(renditions.build_pending())  # not retried
+
+    def test_replaced_image_is_not_overwritten(self):
+        gallery = Gallery.objects.create(title='Fair', cover_image=image_upload('fair.jpg', (800, 600)))
+        stale = Gallery.objects.get(pk=gallery.pk)
+        gallery.cover_image = image_upload('new.jpg', (640, 480))
+        gallery.save()
+        renditions.refresh(stale)
+        gallery.refresh_from_db()
+        self.assertTrue(gallery.cover_renditions['pending'])
+
+    def test_api_exposes_urls(self):
+        gallery = Gallery.objects.create(title='Fair', cover_image=image_upload('fair.jpg', (3000, 2000)))
+        Photo.objects.create(gallery=gallery, image=image_upload('p.png', (600, 400), 'PNG'))
+        renditions.build_pending()
+        data = self.client.get(reverse('gallery-detail', args=[gallery.pk])).json()
+        widths = [v['width'] for v in data['cover_renditions']]
+        self.assertEqual(widths, [480, 1280, 1920, 3000])
+        self.assertTrue(data['cover_renditions'][0]['webp'].startswith('http://testserver/media/renditions/'))
+        self.assertEqual([v['width'] for v in data['photos'][0]['renditions']], [480, 600])
+
+
+class MediaJobTest(TempMediaMixin, TestCase):
+    def upload(self, title='Clip', **fields):
+        return Gallery.objects.create(title=title, cover_image=SimpleUploadedFile('clip.mp4', b'\x00' * 64), **fields)
+
+    def fake_ffmpeg(self, duration=12.3):
+        def transcode(source, target, duration, on_progress=None):
+            on_progress(50)
+            with open(target, 'wb') as f:
+                f.write(b'encoded')
+
+        def extract_poster(source, target, at):
+            Image.new('RGB', (16, 9)).save(target)
+
+        return mock.patch.multiple(media, probe=mock.Mock(return_value=duration),
+                                   transcode=mock.Mock(side_effect=transcode),
+                                   extract_poster=mock.Mock(side_effect=extract_poster))
+
+    def test_upload_only_queues(self):
+        with mock.patch('core.media.subprocess') as subprocess:
+            gallery = self.upload()
+        subprocess.Popen.assert_not_called()
+        job = gallery.media_jobs.get()
+        self.assertEqual((job.status, job.source), ('pending', gallery.cover_image.name))
+        # Re-saving the same upload does not queue it again; images are not queued
+        gallery.save()
+        Gallery.objects.create(title='Photo', cover_image=image_upload('still.jpg', (10, 10)))
+        self.assertEqual(MediaJob.objects.count(), 1)
+
+    def test_job_produces_video_poster_and_duration(self):
+        gallery = self.upload()
+        before = versioning.model_stamp(Gallery).tag
+        with self.fake_ffmpeg():
+            job = media.process(media.claim())
+        self.assertEqual((job.status, job.progress), ('done', 100))
+        gallery.refresh_from_db()
+        self.assertTrue(gallery.video.name.startswith('cas/') and gallery.video.name.endswith('.mp4'))
+        self.assertEqual(MediaBlob.objects.get(pk=gallery.poster.name).refcount, 1)
+        self.assertEqual(gallery.duration, 13)
+        self.assertNotEqual(versioning.model_stamp(Gallery).tag, before)
+        data = self.client.get(reverse('gallery-detail', args=[gallery.pk])).json()
+        self.assertTrue(data['video'].endswith('.mp4'))
+
+    def test_explicit_duration_is_kept(self):
+        gallery = self.upload(duration=30)
+        with self.fake_ffmpeg():
+            media.process(media.claim())
+        gallery.refresh_from_db()
+        self.assertEqual(gallery.duration, 30)
+
+    def test_failures_are_retried_then_given_up(self):
+        self.upload()
+        broken = mock.patch.object(media, 'probe', side_effect=media.MediaError('moov atom not found'))
+        with broken:
+            job = media.process(media.claim())
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIsNone(media.claim())  # backing off
+        for _ in range(media.MAX_ATTEMPTS - 1):
+            MediaJob.objects.update(next_attempt_at=timezone.now())
+            with broken:
+                job = media.process(media.claim())
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('moov atom', job.last_error)
+
+    def test_gallery_list_shows_progress(self):
+        gallery = self.upload()
+        gallery.media_jobs.update(status='processing', progress=40)
+        self.client.force_login(User.objects.create_superuser(username='admin', password='password'))
+        self.assertContains(self.client.get(reverse('gallery_list')), '40%')
+
+    @skipUnless(shutil.which('ffmpeg') and shutil.which('ffprobe'), 'ffmpeg is not installed')
+    def test_real_ffmpeg(self):
+        source = os.path.join(self.media, 'sample.mp4')
+        media.run_ffmpeg(['-f', 'lavfi', '-i', 'testsrc=duration=2:size=320x240:rate=10', source])
+        with open(source, 'rb') as f:
+            gallery = Gallery.objects.create(title='Sample', cover_image=SimpleUploadedFile('sample.mp4', f.read()))
+        job = media.process(media.claim())
+        self.assertEqual(job.status, 'done', job.last_error)
+        gallery.refresh_from_db()
+        self.assertEqual(gallery.duration, 2)
+
+
+class ContentStorageTest(TempMediaMixin, TestCase):
+    def blob(self, field_file):
+        return MediaBlob.objects.get(pk=field_file.name)
+
+    def test_same_bytes_stored_once(self):
+        first = Gallery.objects.create(title='Fair', cover_image=image_upload('fair.jpg'))
+        second = Representative.objects.create(full_name='Ram', designation='अन्य', photo=image_upload('RAM.JPG'))
+        self.assertEqual(first.cover_image.name, second.photo.name)
+        self.assertTrue(first.cover_image.name.startswith('cas/'))
+        self.assertEqual(len(os.listdir(os.path.dirname(first.cover_image.path))), 1)
+        self.assertEqual(self.blob(first.cover_image).refcount, 2)
+
+    def test_replacing_and_deleting_release_references(self):
+        gallery = Gallery.objects.create(title='Fair', cover_image=image_upload('fair.jpg'))
+        old = gallery.cover_image.name
+        gallery.cover_image = image_upload('new.jpg', (30, 20))
+        gallery.save()
+        self.assertEqual(MediaBlob.objects.get(pk=old).refcount, 0)
+        self.assertEqual(self.blob(gallery.cover_image).refcount, 1)
+        # Saving without touching the file leaves the count alone
+        gallery.title = 'Fair 2081'
+        gallery.save()
+        self.assertEqual(self.blob(gallery.cover_image).refcount, 1)
+        gallery.delete()
+        self.assertEqual(MediaBlob.objects.filter(refcount__gt=0).count(), 0)
+
+    def test_prune_deletes_only_old_unreferenced_files(self):
+        kept = Gallery.objects.create(title='Kept', cover_image=image_upload('kept.jpg'))
+        dropped = Gallery.objects.create(title='Dropped', cover_image=image_upload('gone.jpg', (30, 20)))
+        path = dropped.cover_image.path
+        dropped.delete()
+        call_command('prune_media', stdout=StringIO())
+        self.assertTrue(os.path.exists(path))  # still within the grace period
+        MediaBlob.objects.filter(refcount=0).update(released_at=timezone.now() - timedelta(days=2))
+        call_command('prune_media', stdout=StringIO())
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(kept.cover_image.path))
+        self.assertEqual(list(MediaBlob.objects.values_list('pk', flat=True)), [kept.cover_image.name])
+
+    def test_reupload_of_an_unreferenced_file_is_not_pruned(self):
+        dropped = Gallery.objects.create(title='Dropped', cover_image=image_upload('gone.jpg', (30, 20)))
+        dropped.delete()
+        MediaBlob.objects.update(released_at=timezone.now() - timedelta(days=2))
+        # Stored again but its row not saved yet: prune runs in between
+        name = default_storage.save('gallery/again.jpg', image_upload('again.jpg', (30, 20)))
+        call_command('prune_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(pk=name).refcount, 0)
+
+
+class MediaServingTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.gallery = Gallery.objects.create(title='Clip', cover_image=SimpleUploadedFile('clip.mp4', bytes(range(100))))
+        self.url = self.gallery.cover_image.url
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, headers=headers)
+        # Reading the stream to the end closes the response, as a WSGI server would
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_file_is_immutable(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, bytes(range(100))))
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], '"%s"' % os.path.basename(self.url).split('.')[0])
+
+    def test_ranges(self):
+        response, body = self.get(Range='bytes=10-19')
+        self.assertEqual((response.status_code, body), (206, bytes(range(10, 20))))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.get(Range='bytes=-5')[1], bytes(range(95, 100)))
+        self.assertEqual(self.get(Range='bytes=90-500')[1], bytes(range(90, 100)))
+        response, _ = self.get(Range='bytes=100-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */100'))
+        # Several ranges, or an If-Range for another version, get the whole file
+        self.assertEqual(self.get(Range='bytes=0-1,5-6')[0].status_code, 200)
+        self.assertEqual(self.get(Range='bytes=0-1', **{'If-Range': '"stale"'})[0].status_code, 200)
+
+    def test_revalidation(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(**{'If-None-Match': etag})
+        self.assertEqual((response.status_code, body), (304, b''))
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_legacy_names_are_revalidated(self):
+        os.makedirs(os.path.join(self.media, 'gallery'))
+        with open(os.path.join(self.media, 'gallery', 'old.jpg'), 'wb') as f:
+            f.write(b'jpeg')
+        response, body = self.get('/media/gallery/old.jpg')
+        self.assertEqual(body, b'jpeg')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.get('/media/../manage.py')[0].status_code, 404)
+        self.assertEqual(self.get('/media/gallery')[0].status_code, 404)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_accel_redirect(self):
+        response, body = self.get(Range='bytes=0-9')
+        self.assertEqual((response.status_code, body), (200, b''))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.gallery.cover_image.name)
+
+
+class PlayerManifestTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = Device.objects.create(name='Lobby')
+        self.url = reverse('device-precache', args=[self.device.pk])
+
+    def test_lists_what_the_player_loads(self):
+        image = Gallery.objects.create(title='Fair', cover_image=image_upload('fair.jpg', (3000, 2000)))
+        clip = Gallery.objects.create(title='Clip', cover_image=SimpleUploadedFile('clip.mp4', b'\x00' * 64))
+        Gallery.objects.create(title='Talk', youtube_url='https://youtu.be/dQw4w9WgXcQ')
+        rep = Representative.objects.create(full_name='Ram', designation='अन्य', photo=image_upload('ram.jpg'))
+        image, rep = built(image), built(rep)
+
+        data = self.client.get(self.url, {'width': 1000}).json()
+        self.assertEqual(data['width'], 1000)
+        self.assertEqual(data['budget'], 512 * 1024 * 1024)
+        urls = [entry['url'] for entry in data['entries']]
+        self.assertEqual(urls, [
+            'http://testserver/media/renditions/' + image.cover_renditions['variants'][1]['webp'],
+            'http://testserver' + clip.cover_image.url,
+            'http://testserver/media/renditions/' + rep.photo_renditions['variants'][0]['webp'],
+        ])
+        self.assertEqual(data['entries'][1]['size'], 64)
+
+    def test_processed_video_and_poster_replace_the_upload(self):
+        clip = Gallery.objects.create(title='Clip', cover_image=SimpleUploadedFile('clip.mp4', b'\x00' * 64))
+        Gallery.objects.filter(pk=clip.pk).update(video='cas/aa/video.mp4', poster='cas/bb/poster.jpg')
+        for name in ('cas/aa/video.mp4', 'cas/bb/poster.jpg'):
+            os.makedirs(os.path.dirname(os.path.join(self.media, name)))
+            with open(os.path.join(self.media, name), 'wb') as f:
+                f.write(b'out')
+        entries = self.client.get(self.url).json()['entries']
+        self.assertEqual([e['url'] for e in entries],
+                         ['http://testserver/media/cas/aa/video.mp4', 'http://testserver/media/cas/bb/poster.jpg'])
+
+    def test_prefetch_follows_rotation(self):
+        Gallery.objects.create(title='Clip', cover_image=SimpleUploadedFile('clip.mp4', b'\x00' * 64), duration=25)
+        Gallery.objects.create(title='Talk', youtube_url='https://youtu.be/dQw4w9WgXcQ')
+        Gallery.objects.create(title='Text only')
+        image = built(Gallery.objects.create(title='Fair', cover_image=image_upload('fair.jpg', (800, 600))))
+
+        data = self.client.get(reverse('device-prefetch', args=[self.device.pk]), {'width': 480}).json()
+        items = data['items']
+        self.assertEqual([(i['kind'], i['duration']) for i in items],
+                         [('video', 25), ('youtube', None), ('text', 10), ('image', 10)])
+        self.assertEqual([i['id'] for i in items], [g['id'] for g in
+                         self.client.get(reverse('device-playlist', args=[self.device.pk])).json()['galleries']])
+        self.assertEqual(items[0]['bytes'], 64)
+        variant = image.cover_renditions['variants'][0]
+        self.assertEqual(items[3]['media'][0]['url'], 'http://testserver/media/renditions/' + variant['webp'])
+        self.assertEqual(items[3]['bytes'], os.path.getsize(os.path.join(self.media, 'renditions', variant['webp'])))
+        self.assertEqual(items[1]['media'], [])
+
+    def test_conditional_and_service_worker(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.get(reverse('player_service_worker'))
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        # Its scope, the directory it is served from, holds the player pages and nothing else
+        scope = reverse('player_service_worker').rpartition('/')[0] + '/'
+        self.assertEqual(scope, '/display/')
+        self.assertTrue(reverse('player_display', args=[self.device.pk]).startswith(scope))
+        self.assertContains(response, "const MEDIA_PREFIX = '/media/';")
+
+
+class StubWebhookServer:
+    """Local HTTP server standing in for n8n; answers with the queued status codes."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.received = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                stub.received.append(json.loads(body))
+                self.send_response(stub.statuses.pop(0) if stub.statuses else 200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/webhook'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.stub = StubWebhookServer()
+        self.addCleanup(self.stub.close)
+        settings_override = override_settings(N8N_WEBHOOK_URL=self.stub.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def publish(self, **fields):
+        return Notice.objects.create(title='Water cut', content='Tomorrow 10-4', status='published', **fields)
+
+    def test_save_does_not_call_webhook(self):
+        self.publish()
+        self.assertEqual(self.stub.received, [])
+        self.assertEqual(OutboxEvent.objects.filter(status='pending').count(), 1)
+
+    def test_dispatch_delivers_batch(self):
+        self.publish()
+        self.publish(priority='high')
+        self.assertEqual(outbox.dispatch_batch(), (2, 0))
+        self.assertEqual([p['event'] for p in self.stub.received], ['notice_published'] * 2)
+        self.assertEqual(OutboxEvent.objects.filter(status='sent').count(), 2)
+
+    def test_unchanged_resave_is_deduplicated(self):
+        notice = self.publish()
+        notice.save()
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+        notice.content = 'Tomorrow 10-5'
+        notice.save()
+        self.assertEqual(OutboxEvent.objects.count(), 2)
+
+    def test_failure_is_retried_with_backoff(self):
+        self.stub.statuses = [500]
+        self.publish()
+        self.assertEqual(outbox.dispatch_batch(), (0, 1))
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('pending', 1))
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(outbox.dispatch_batch(), (0, 0))
+
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.dispatch_batch(), (1, 0))
+        self.assertEqual(len(self.stub.received), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        self.publish()
+        OutboxEvent.objects.update(attempts=outbox.MAX_ATTEMPTS - 1)
+        self.stub.statuses = [503]
+        outbox.dispatch_batch()
+        self.assertEqual(OutboxEvent.objects.get().status, 'failed')
+
+    def test_dispatcher_exits_cleanly_without_webhook(self):
+        # docker-compose restarts the dispatcher only on failure
+        out = StringIO()
+        with self.settings(N8N_WEBHOOK_URL=''):
+            self.publish()
+            call_command('dispatch_outbox', stdout=out)
+        self.assertIn('not configured', out.getvalue())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class AuditBufferTest(TestCase):
+    def test_buffered_scope_writes_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with audit.buffered():
+                for i in range(5):
+                    Device.objects.create(name=f'Screen {i}', location_description='Hall')
+                self.assertEqual(AuditLog.objects.count(), 0)
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+    def test_rolled_back_entries_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with audit.buffered():
+                Device.objects.create(name='Kept', location_description='Hall')
+                try:
+                    with transaction.atomic():
+                        Device.objects.create(name='Rolled back', location_description='Hall')
+                        raise ValueError
+                except ValueError:
+                    pass
+        self.assertEqual(list(AuditLog.objects.values_list('details', flat=True)),
+                         ['डिजिटल सूचना पाटी Created: Kept'])
+
+
+class AuditRequestTest(TransactionTestCase):
+    # Real commits, so on_commit hooks fire inside the request as in production
+    def test_request_uses_one_insert(self):
+        admin = User.objects.create_superuser(username='admin', password='password')
+        self.client.force_login(admin)
+        inserts = []
+
+        def count_inserts(execute, sql, params, many, context):
+            if sql.startswith('INSERT INTO "core_auditlog"'):
+                inserts.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_inserts):
+            response = self.client.post(reverse('device_create'), {
+                'name': 'Gate', 'location_description': 'Entrance', 'is_active': 'on',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(AuditLog.objects.filter(model_name=Device._meta.verbose_name).count(), 1)
+        self.assertEqual(len(inserts), 1)
+
+
+@skipUnless(connection.vendor == 'sqlite' and connection.settings_dict['OPTIONS'].get('init_command'),
+            'SQLite single-node mode is off')
+class SQLiteSingleNodeTest(SimpleTestCase):
+    """The settings' SQLite options, on database files (the test database lives in memory)."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def connect(self, name, options=None):
+        options = connection.settings_dict['OPTIONS'] if options is None else options
+        path = os.path.join(self.directory, f'{name}.sqlite3')
+        db = SQLiteDatabaseWrapper({**connection.settings_dict, 'NAME': path, 'OPTIONS': options}, name)
+        self.addCleanup(db.close)
+        return db
+
+    def query(self, db, sql):
+        with db.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    def test_pragmas(self):
+        db = self.connect('signage')
+        self.assertEqual(self.query(db, 'PRAGMA journal_mode'), [('wal',)])
+        self.assertEqual(self.query(db, 'PRAGMA synchronous'), [(1,)])  # NORMAL
+        self.assertEqual(self.query(db, 'PRAGMA mmap_size'), [(256 * 1024 * 1024,)])
+        self.assertEqual(self.query(db, 'PRAGMA cache_size'), [(-64 * 1024,)])
+        self.assertEqual(self.query(db, 'PRAGMA busy_timeout'), [(20000,)])
+        self.assertEqual(db.transaction_mode, 'IMMEDIATE')
+
+    def readers_during_a_write(self, name, options=None):
+        """Rows a player read sees while heartbeats and audit entries are mid-write, and how long it took."""
+        writer, reader = self.connect(name, options), self.connect(name, options)
+        self.query(writer, 'CREATE TABLE core_device (id integer PRIMARY KEY, last_seen text)')
+        self.query(writer, "INSERT INTO core_device (last_seen) VALUES ('09:00')")
+        self.query(writer, 'BEGIN EXCLUSIVE')
+        self.query(writer, "UPDATE core_device SET last_seen = '09:01'")
+        self.query(writer, 'CREATE TABLE core_auditlog (id integer PRIMARY KEY)')
+        try:
+            started = time.perf_counter()
+            rows = self.query(reader, 'SELECT last_seen FROM core_device')
+            return rows, time.perf_counter() - started
+        finally:
+            self.query(writer, 'COMMIT')
+
+    def test_readers_do_not_wait_for_writers(self):
+        rows, elapsed = self.readers_during_a_write('signage')
+        self.assertEqual(rows, [('09:00',)])  # the last committed state
+        self.assertLess(elapsed, 1)
+
+    def test_rollback_journal_blocks_readers(self):
+        # What SQLITE_SINGLE_NODE=False gets: the reader waits out its timeout, then fails
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            self.readers_during_a_write('untuned', {'timeout': 0.2})
+
+
+class GunicornConfigTest(SimpleTestCase):
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+
+    def test_sized_from_cpus(self):
+        with mock.patch('os.sched_getaffinity', return_value={0, 1, 2, 3}), \
+                mock.patch('builtins.open', side_effect=OSError):  # no cgroup quota
+            config = self.load()
+        self.assertEqual((config['workers'], config['threads'], config['worker_class']), (5, 4, 'gthread'))
+        self.assertTrue(config['preload_app'])
+        self.assertEqual((config['max_requests'], config['max_requests_jitter']), (1000, 100))
+
+    def test_container_quota_and_environment(self):
+        with mock.patch('os.sched_getaffinity', return_value=set(range(16))), \
+                mock.patch('builtins.open', mock.mock_open(read_data='150000 100000\n')):
+            self.assertEqual(self.load()['CPUS'], 2)  # docker --cpus=1.5
+        config = self.load(GUNICORN_WORKERS='3', GUNICORN_THREADS='1', GUNICORN_PRELOAD='False',
+                           GUNICORN_MAX_REQUESTS='500')
+        self.assertEqual((config['workers'], config['threads'], config['worker_class']), (3, 1, 'sync'))
+        self.assertFalse(config['preload_app'])
+        self.assertEqual(config['max_requests_jitter'], 50)
+
+
+class ImportSqliteTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'old.sqlite3')
+        # The SQLite files get aliases at runtime, which TestCase otherwise refuses to connect
+        allowed = mock.patch.object(type(self), 'databases', {'default', 'old', 'sqlite_import'})
+        allowed.start()
+        self.addCleanup(allowed.stop)
+        self.created = timezone.now() - timedelta(days=30)
+        # An old db.sqlite3: bulk inserts, so no signals write to the test database
+        with sqlite_connection(self.path, 'old') as alias:
+            call_command('migrate', database=alias, verbosity=0)
+            editor = User(pk=5, username='editor')
+            editor.set_password('secret')
+            User.objects.using(alias).bulk_create([editor])
+            Device.objects.using(alias).bulk_create([Device(pk=7, name='Lobby', location_description='Hall')])
+            with keep_timestamps(Notice):
+                Notice.objects.using(alias).bulk_create([Notice(pk=3, title='Holiday', content='Closed', status='published',
+                                                                created_by_id=5, created_at=self.created, updated_at=self.created)])
+            Notice.target_devices.through.objects.using(alias).bulk_create(
+                [Notice.target_devices.through(notice_id=3, device_id=7)])
+
+    def test_copies_rows_with_ids_and_timestamps(self):
+        out = StringIO()
+        call_command('import_sqlite', self.path, stdout=out)
+        notice = Notice.objects.get(pk=3)
+        self.assertEqual((notice.created_at, notice.created_by.username), (self.created, 'editor'))
+        self.assertEqual(list(notice.target_devices.values_list('pk', flat=True)), [7])
+        self.assertTrue(User.objects.get(pk=5).check_password('secret'))
+        self.assertGreater(Device.objects.create(name='Office', location_description='Hall').pk, 7)
+        self.assertIn('core.Notice', out.getvalue())
+
+    def test_refuses_to_overwrite(self):
+        call_command('import_sqlite', self.path, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('import_sqlite', self.path, stdout=StringIO())
+        call_command('import_sqlite', self.path, replace=True, stdout=StringIO())
+        self.assertEqual(Notice.objects.count(), 1)
+
+
+class IndexUsageTest(TestCase):
+    """The hot filters must be answered from an index, never by reading every row."""
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser(username='admin', password='password'))
+        if connection.vendor == 'postgresql':
+            # Empty test tables are cheapest to scan; ask whether an index *can* serve the query
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, model, fields):
+        self.assertPlanUsesIndex(queryset.explain(), model, fields)
+
+    def assertPlanUsesIndex(self, plan, model, fields):
+        index = next(i.name for i in model._meta.indexes if i.fields == fields)
+        self.assertIn(index, plan)
+        # SQLite: "SCAN core_notice" with no "USING ... INDEX"; PostgreSQL: "Seq Scan on core_notice"
+        self.assertIsNone(re.search(r'^.*\bSCAN \w+$|Seq Scan', plan, re.MULTILINE), plan)
+
+    def view_plans(self, url, model):
+        """EXPLAIN of every query the page at url runs against model's table."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        table = connection.ops.quote_name(model._meta.db_table)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if re.search(rf'\bFROM {re.escape(table)}', query['sql']):
+                    cursor.execute(f"{connection.ops.explain_query_prefix()} {query['sql']}")
+                    plans.append('\n'.join(' '.join(map(str, row)) for row in cursor.fetchall()))
+        self.assertTrue(plans, f"{url} ran no query on {table}")
+        return plans
+
+    def test_published_notices(self):
+        self.assertUsesIndex(published_notices(), Notice, ['status', '-published_date'])
+        device = Device.objects.create(name='Lobby', location_description='Hall')
+        self.assertUsesIndex(published_notices(device), Notice, ['status', '-published_date'])
+
+    def test_dashboard_counts(self):
+        # The queries DashboardView runs, so a change to its filters is checked too
+        for plan in self.view_plans(reverse('dashboard'), Notice):
+            self.assertPlanUsesIndex(plan, Notice, ['status', '-published_date'])
+        for plan in self.view_plans(reverse('dashboard'), Device):
+            self.assertPlanUsesIndex(plan, Device, ['is_active'])
+
+    def test_system_report_logs(self):
+        for plan in self.view_plans(reverse('system_report'), AuditLog):
+            self.assertPlanUsesIndex(plan, AuditLog, ['-timestamp'])
+
+    def test_active_tickers(self):
+        self.assertUsesIndex(TickerMessage.objects.filter(is_active=True), TickerMessage, ['order', '-created_at'])
+
+
+class QueryCountTest(TestCase):
+    """
+    Every route in core/urls.py must run the same number of queries with
+    10, 1,000 and 10,000 rows per table; a budget that grows with the data
+    is an N+1 regression.
+    """
+    SCALES = (10, 1000, 10000)
+
+    # route name -> (query budget, method)
+    BUDGETS = {
+        None: (2, 'get'),
+        'dashboard': (7, 'get'),
+        'notice_list': (3, 'get'), 'notice_create': (3, 'get'),
+        'notice_edit': (5, 'get'), 'notice_delete': (3, 'get'),
+        'device_list': (3, 'get'), 'device_create': (2, 'get'),
+        'player_display': (2, 'get'),
+        'gallery_list': (3, 'get'), 'gallery_create': (2, 'get'),
+        'gallery_edit': (3, 'get'), 'gallery_delete': (3, 'get'),
+        'charter_list': (3, 'get'), 'charter_create': (2, 'get'),
+        'charter_edit': (3, 'get'), 'charter_delete': (3, 'get'),
+        'representative_list': (3, 'get'), 'representative_create': (2, 'get'),
+        'representative_edit': (3, 'get'), 'representative_delete': (3, 'get'),
+        'ticker_list': (3, 'get'), 'ticker_create': (2, 'get'),
+        'ticker_edit': (3, 'get'), 'ticker_delete': (3, 'get'),
+        'user_list': (3, 'get'), 'user_create': (2, 'get'), 'user_edit': (3, 'get'),
+        'user_password_change': (3, 'get'), 'user_delete': (3, 'get'),
+        'contact_list': (3, 'get'), 'contact_create': (2, 'get'),
+        'contact_edit': (3, 'get'), 'contact_delete': (3, 'get'),
+        'my_password_change': (2, 'get'), 'settings': (2, 'get'),
+        'action_request_list': (3, 'get'), 'action_request_create': (3, 'get'),
+        'action_request_delete': (4, 'get'), 'system_report': (11, 'get'),
+        'device_events': (3, 'get'),
+        'api-root': (2, 'get'),
+        'player_service_worker': (2, 'get'),
+        # device-playlist resolves to device_playlist too; bulk-inserted devices have no
+        # snapshot, so the stamp lookup before falling back to the viewset costs one query
+        'device_playlist': (11, 'get'),
+        'device-list': (3, 'get'), 'device-detail': (3, 'get'), 'device-playlist': (11, 'get'),
+        'device-precache': (6, 'get'), 'device-prefetch': (6, 'get'),
+        'device-heartbeat': (3, 'post'), 'device-heartbeats': (7, 'post'),
+        'notice-list': (5, 'get'), 'notice-detail': (5, 'get'), 'notice-published': (5, 'get'),
+        'gallery-list': (5, 'get'), 'gallery-detail': (5, 'get'),
+        'citizencharter-list': (4, 'get'), 'citizencharter-detail': (4, 'get'),
+        'tickermessage-list': (4, 'get'), 'tickermessage-detail': (4, 'get'),
+        'representative-list': (4, 'get'), 'representative-detail': (4, 'get'),
+        'nepali_date': (2, 'get'),
+        'api_token_auth': (7, 'post'),
+    }
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.seeded = 0
+
+    def seed(self, total):
+        """Top every table up to `total` rows (bulk inserts, so no signals fire)."""
+        rows = range(self.seeded, total)
+        User.objects.bulk_create(User(username=f'user{i}') for i in rows)
+        devices = Device.objects.bulk_create(Device(name=f'Screen {i}', location_description='Hall') for i in rows)
+        notices = Notice.objects.bulk_create(
+            Notice(title=f'Notice {i}', content='Body', status='published' if i % 2 else 'draft',
+                   published_date=timezone.now(), created_by=self.admin) for i in rows)
+        Notice.target_devices.through.objects.bulk_create(
+            Notice.target_devices.through(notice_id=notice.pk, device_id=device.pk)
+            for notice, device in zip(notices, devices))
+        galleries = Gallery.objects.bulk_create(Gallery(title=f'Album {i}', created_by=self.admin) for i in rows)
+        Photo.objects.bulk_create(Photo(gallery=gallery, image=f'gallery/{gallery.title}-{k}.jpg')
+                                  for gallery in galleries for k in range(2))
+        CitizenCharter.objects.bulk_create(
+            CitizenCharter(service_name=f'Service {i}', required_docs='Citizenship', service_time='1 day',
+                           service_fee='Free', responsible_officer='Admin section') for i in rows)
+        TickerMessage.objects.bulk_create(TickerMessage(content=f'Ticker {i}', order=i) for i in rows)
+        Representative.objects.bulk_create(
+            Representative(full_name=f'Person {i}', designation=Representative.DESIGNATION_CHOICES[0][0], order=i)
+            for i in rows)
+        Contact.objects.bulk_create(Contact(full_name=f'Contact {i}', phone_number='9800000000') for i in rows)
+        ActionRequest.objects.bulk_create(
+            ActionRequest(user=self.admin, model_name='Notice', object_id=notice.pk, object_title=notice.title,
+                          request_type='edit', reason='Typo') for notice in notices)
+        AuditLog.objects.bulk_create(AuditLog(user=self.admin, action='Updated', model_name='Notice',
+                                              object_id=str(i)) for i in rows)
+        self.seeded = total
+
+    def route_names(self):
+        from core import urls
+
+        def walk(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from walk(pattern.url_patterns)
+                else:
+                    yield pattern.name
+        return set(walk(urls.urlpatterns))
+
+    def requests(self):
+        """(route name, client method, url, body) for every budgeted route."""
+        device, notice = Device.objects.first(), Notice.objects.first()
+        args = {
+            'notice_edit': [notice.pk], 'notice_delete': [notice.pk],
+            'player_display': [device.pk], 'device_events': [device.pk],
+            'device-detail': [device.pk], 'device-playlist': [device.pk], 'device_playlist': [device.pk],
+            'device-heartbeat': [device.pk],
+            'device-precache': [device.pk], 'device-prefetch': [device.pk],
+            'notice-detail': [notice.pk],
+            'action_request_create': ['Notice', notice.pk, 'edit'],
+        }
+        for prefix, model in (('gallery', Gallery), ('charter', CitizenCharter), ('citizencharter', CitizenCharter),
+                              ('representative', Representative), ('ticker', TickerMessage),
+                              ('tickermessage', TickerMessage), ('user', User), ('contact', Contact),
+                              ('action_request', ActionRequest)):
+            pk = model.objects.order_by('pk').values_list('pk', flat=True).first()
+            for suffix in ('_edit', '_delete', '-detail', '_password_change'):
+                args.setdefault(prefix + suffix, [pk])
+        bodies = {
+            'device-heartbeats': {'devices': [{'id': device.pk, 'uptime': 1}]},
+            'api_token_auth': {'username': 'admin', 'password': 'password'},
+        }
+        for name, (budget, method) in self.BUDGETS.items():
+            url = '/' if name is None else reverse(name, args=args.get(name, []))
+            yield name, budget, getattr(self.client, method), url, bodies.get(name, {})
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(self.route_names(), set(self.BUDGETS))
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        self.client.force_login(self.admin)
+        for scale in self.SCALES:
+            self.seed(scale)
+            for name, budget, send, url, body in self.requests():
+                with self.subTest(route=name, rows=scale):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = send(url, body, content_type='application/json') if body else send(url)
+                    self.assertLess(response.status_code, 400)
+                    self.assertLessEqual(len(queries), budget, f'{name} at {scale} rows: {len(queries)} queries')
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
 from . import views
 from . import admin_views
+from . import async_views
 
 router = DefaultRouter()
 # router.register(r'offices', views.OfficeViewSet)
@@ -31,6 +33,7 @@ urlpatterns = [
     path('devices/list/', admin_views.DeviceListView.as_view(), name='device_list'),
     path('devices/create/', admin_views.DeviceCreateView.as_view(), name='device_create'),
     path('display/<int:device_id>/', admin_views.PlayerView.as_view(), name='player_display'),
+    path('display/sw.js', views.player_service_worker, name='player_service_worker'),
     
     # Gallery & Charter
     path('gallery/list/', admin_views.GalleryListView.as_view(), name='gallery_list'),
@@ -72,6 +75,9 @@ urlpatterns = [
 
 
     # API endpoints
+    path('api/v1/devices/<int:device_id>/events/', views.device_events, name='device_events'),
+    # Ahead of the router: players get the pre-rendered snapshot of DeviceViewSet.playlist
+    path('api/v1/devices/<int:device_id>/playlist/', views.device_playlist, name='device_playlist'),
     path('api/v1/', include(router.urls)),
     path('api/v1/nepali-date/', views.get_nepali_date, name='nepali_date'),
     path('api/v1/auth/login/', obtain_auth_token, name='api_token_auth'),
@@ -83,3 +89,15 @@ urlpatterns = [
 
     path('reports/', admin_views.ReportView.as_view(), name='system_report'),
 ]
+
+# Player endpoints on the event loop (core/async_views.py), ahead of the routes
+# they stand in for; unnamed, so reverse() keeps giving the routes above
+async_urlpatterns = [
+    path('api/v1/devices/<int:device_id>/playlist/', async_views.device_playlist),
+    path('api/v1/notices/published/', async_views.published),
+    path('api/v1/ticker/', async_views.ticker_list),
+    path('api/v1/nepali-date/', async_views.nepali_date),
+]
+
+if settings.PLAYER_ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -0,0 +1,93 @@
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ContentVersion
+
+# tag: opaque string that changes whenever the stamped content changes
+# last_modified: newest change time covered by the stamp (or None)
+ContentStamp = namedtuple('ContentStamp', ['tag', 'last_modified'])
+
+DEVICE_PREFIX = 'device:'
+
+
+def model_key(model):
+    return model._meta.label_lower
+
+
+def device_key(device_id):
+    return f'{DEVICE_PREFIX}{device_id}'
+
+
+def bump(*keys):
+    """Advance the counters for keys, creating any that do not exist yet."""
+    now = timezone.now()
+    updated = ContentVersion.objects.filter(key__in=keys).update(version=F('version') + 1, updated_at=now)
+    if updated < len(keys):
+        ContentVersion.objects.bulk_create(
+            [ContentVersion(key=key, version=1, updated_at=now) for key in keys],
+            ignore_conflicts=True,
+        )
+
+
+def bump_content(model, device_ids=None, emergency=False):
+    """
+    Record a change to model's rows: bumps the model counter and the
+    counters of the devices that display it (every device when device_ids
+    is None), then notifies connected players once the transaction commits.
+    """
+    from . import events
+
+    bump(model_key(model))
+    if device_ids is None:
+        ContentVersion.objects.filter(key__startswith=DEVICE_PREFIX).update(
+            version=F('version') + 1, updated_at=timezone.now())
+    elif device_ids:
+        device_ids = set(device_ids)
+        bump(*(device_key(pk) for pk in device_ids))
+    else:
+        return
+
+    topic = events.TOPICS.get(model_key(model))
+    if topic:
+        transaction.on_commit(lambda: events.broker.publish(topic, device_ids, emergency))
+
+
+def _counters(keys):
+    return ContentVersion.objects.filter(key__in=keys).values_list('key', 'version', 'updated_at')
+
+
+def _stamp(keys, rows):
+    versions = {key: (version, updated_at) for key, version, updated_at in rows}
+    tag = ';'.join(f'{key}:{versions.get(key, (0,))[0]}' for key in sorted(keys))
+    last_modified = max((updated_at for _, updated_at in versions.values()), default=None)
+    return ContentStamp(tag, last_modified)
+
+
+def content_stamp(*keys):
+    """Stamp over the given counters in one primary-key lookup."""
+    return _stamp(keys, _counters(keys))
+
+
+async def acontent_stamp(*keys):
+    """content_stamp() for async views."""
+    return _stamp(keys, [row async for row in _counters(keys)])
+
+
+def model_stamp(*models):
+    return content_stamp(*(model_key(model) for model in models))
+
+
+async def amodel_stamp(*models):
+    return await acontent_stamp(*(model_key(model) for model in models))
+
+
+def device_stamp(device_id):
+    """Stamp covering everything on one device's playlist."""
+    return content_stamp(device_key(device_id))
+
+
+async def adevice_stamp(device_id):
+    return await acontent_stamp(device_key(device_id))
@@ -1,37 +1,232 @@
 from django.views.generic import CreateView, TemplateView
 from django.urls import reverse_lazy
-from django.shortcuts import get_object_or_404
+from django.shortcuts import get_object_or_404, render
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from django.utils import timezone
-from .models import User, Device, Notice, Gallery, CitizenCharter, TickerMessage, Representative
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+import gzip
+import hashlib
+from .models import User, Device, Notice, Gallery, Photo, CitizenCharter, TickerMessage, Representative
 from .serializers import (UserSerializer, DeviceSerializer,
                           NoticeSerializer, GallerySerializer, CitizenCharterSerializer, TickerMessageSerializer,
-                          RepresentativeSerializer)
+                          RepresentativeSerializer, HeartbeatSerializer, BulkHeartbeatSerializer)
+from .playlist import build_playlist, published_notices
+from .versioning import model_stamp, device_stamp
+from .events import device_event_stream
+from . import manifest, content_cache, compression, snapshots
 
-class TickerViewSet(viewsets.ModelViewSet):
+
+def conditional_response(request, stamp, render, *variant):
+    """
+    Answer a GET from a content stamp instead of from the response body:
+    304 while the client's validators still match, otherwise render() and
+    attach ETag / Last-Modified. variant tells apart representations that
+    share a stamp (renderer format, device, day, ...).
+    """
+    etag, last_modified = validators(request, stamp, *variant)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = render()
+    return set_validators(response, etag, last_modified)
+
+
+def validators(request, stamp, *variant):
+    """(ETag, Last-Modified timestamp) of the representation conditional_response() answers with."""
+    key = '|'.join([stamp.tag, request.get_full_path(), *map(str, variant)])
+    etag = quote_etag(hashlib.sha1(key.encode()).hexdigest())
+    last_modified = int(stamp.last_modified.timestamp()) if stamp.last_modified else None
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        # Precompressed bodies (cache entries, snapshots) get a weak tag, as compress_response() gives
+        response['ETag'] = 'W/' + etag if response.has_header('Content-Encoding') else etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        # Let browsers keep the body but revalidate on every poll
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+class ConditionalResponseMixin:
+    """
+    ETag / Last-Modified for read-mostly ViewSets. The validators come from
+    the ContentVersion counters of stamp_models, so an unchanged poll is
+    answered with 304 before the queryset is evaluated or the serializer runs.
+    """
+    stamp_models = ()
+    # Actions whose rendered JSON is also kept in the cache (core/content_cache.py)
+    cached_actions = ()
+
+    def get_content_stamp(self):
+        return model_stamp(*self.stamp_models)
+
+    def conditional(self, request, render, *variant):
+        stamp = self.get_content_stamp()
+        variant = (request.accepted_renderer.format, *variant)
+        # The browsable API page embeds the user and a CSRF token: never cached
+        if self.action in self.cached_actions and request.accepted_renderer.format == 'json':
+            cache_key = content_cache.key(stamp, request, *variant)
+
+            def render(render=render):
+                response = content_cache.get(cache_key, request)
+                if response is None:
+                    response = render()
+                    response.content_cache_key = cache_key  # stored once rendered
+                return response
+        return conditional_response(request, stamp, render, *variant)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        cache_key = getattr(response, 'content_cache_key', None)
+        if cache_key:
+            content_cache.store(cache_key, response.render())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        render = super().list
+        return self.conditional(request, lambda: render(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        render = super().retrieve
+        return self.conditional(request, lambda: render(request, *args, **kwargs))
+
+
+def requested_fields(request):
+    """The field names of ?fields= on a read, or None."""
+    if request.method not in permissions.SAFE_METHODS:
+        return None
+    fields = [name.strip() for name in request.GET.get('fields', '').split(',')]
+    return [name for name in fields if name] or None
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields=id,title on reads: the serializer drops every other field and,
+    when all requested fields are table columns, the query loads only those.
+    """
+    def requested_fields(self):
+        return requested_fields(self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.requested_fields()
+        if fields and self.action in ('list', 'retrieve'):
+            columns = {f.name for f in queryset.model._meta.concrete_fields}
+            if columns.issuperset(fields):
+                # The paginator reads the ordering columns to build the next cursor
+                ordering = getattr(self, 'cursor_ordering', ())
+                ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+                queryset = queryset.only(*fields, *(o.lstrip('-') for o in ordering if o.lstrip('-') != 'pk'))
+        return queryset
+
+
+class TickerViewSet(SparseFieldsetMixin, ConditionalResponseMixin, viewsets.ModelViewSet):
     queryset = TickerMessage.objects.filter(is_active=True).order_by('order', '-created_at')
     serializer_class = TickerMessageSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cursor_ordering = ('order', '-created_at')
+    stamp_models = (TickerMessage,)
+    cached_actions = ('list', 'retrieve')
 
 
-class DeviceViewSet(viewsets.ModelViewSet):
+class DeviceViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Device.objects.all()
     serializer_class = DeviceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = 'pk'
 
     @action(detail=True, methods=['post'])
     def heartbeat(self, request, pk=None):
-        device = self.get_object()
-        device.last_seen = timezone.now()
-        device.save()
+        """
+        Hot path: a single UPDATE of last_seen (and telemetry when sent).
+        No get_object()/save(), so no signals fire and no audit row is written.
+        """
+        serializer = HeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        fields = {'last_seen': timezone.now()}
+        if serializer.validated_data:
+            fields['telemetry'] = serializer.validated_data
+        if not str(pk).isdigit() or not Device.objects.filter(pk=pk).update(**fields):
+            raise NotFound()
         return Response({'status': 'active'})
 
-class NoticeViewSet(viewsets.ModelViewSet):
-    queryset = Notice.objects.all()
+    @action(detail=False, methods=['post'])
+    def heartbeats(self, request):
+        """
+        Bulk heartbeat for site gateways: one request for all the screens
+        behind them. last_seen is set with one UPDATE, reported telemetry
+        with one bulk_update; ids that match no device are returned.
+        """
+        serializer = BulkHeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        beats = {}
+        for beat in serializer.validated_data['devices']:
+            beats[beat.pop('id')] = beat  # a repeated id: the last entry wins
+        known = set(Device.objects.filter(pk__in=beats).values_list('pk', flat=True))
+
+        with transaction.atomic():
+            Device.objects.filter(pk__in=known).update(last_seen=timezone.now())
+            reported = [Device(pk=pk, telemetry=beats[pk]) for pk in known if beats[pk]]
+            Device.objects.bulk_update(reported, ['telemetry'], batch_size=500)
+
+        return Response({'status': 'active', 'updated': len(known), 'unknown': sorted(beats.keys() - known)})
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    def playlist(self, request, pk=None):
+        """Public endpoint: the full, device-filtered payload a player needs per refresh"""
+        device = self.get_object()
+        return conditional_response(
+            request, device_stamp(device.pk),
+            lambda: Response(build_playlist(device, self.get_serializer_context())),
+            request.accepted_renderer.format, device.name, timezone.now().date(),
+        )
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    def precache(self, request, pk=None):
+        """Public endpoint: media the player's service worker keeps for offline playback"""
+        device = self.get_object()
+        width = manifest.screen_width(request.query_params.get('width'))
+        return conditional_response(
+            request, device_stamp(device.pk),
+            lambda: Response(manifest.precache(device, width, request)),
+            request.accepted_renderer.format,
+        )
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    def prefetch(self, request, pk=None):
+        """Public endpoint: the gallery rotation with media sizes and durations, for preloading"""
+        device = self.get_object()
+        width = manifest.screen_width(request.query_params.get('width'))
+        return conditional_response(
+            request, device_stamp(device.pk),
+            lambda: Response(manifest.prefetch(device, width, request)),
+            request.accepted_renderer.format,
+        )
+
+class NoticeViewSet(SparseFieldsetMixin, ConditionalResponseMixin, viewsets.ModelViewSet):
+    queryset = Notice.objects.prefetch_related('target_devices')
     serializer_class = NoticeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cursor_ordering = '-created_at'
+    stamp_models = (Notice,)
+    cached_actions = ('published',)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -39,33 +234,117 @@ class NoticeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def published(self, request):
         """Public endpoint for players to get published notices"""
-        today = timezone.now().date()
-        from django.db.models import Q
-        notices = Notice.objects.filter(
-            Q(status='published') & 
-            (Q(expiry_date__isnull=True) | Q(expiry_date__gte=today))
-        ).order_by('-published_date')
-        serializer = self.get_serializer(notices, many=True)
-        return Response(serializer.data)
-
-class GalleryViewSet(viewsets.ModelViewSet):
-    queryset = Gallery.objects.all()
+        def render():
+            serializer = self.get_serializer(published_notices(), many=True)
+            return Response(serializer.data)
+        # Expiry is date based, so the same table state differs per day
+        return self.conditional(request, render, timezone.now().date())
+
+class GalleryViewSet(SparseFieldsetMixin, ConditionalResponseMixin, viewsets.ModelViewSet):
+    queryset = Gallery.objects.prefetch_related('photos')
     serializer_class = GallerySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cursor_ordering = 'pk'
+    stamp_models = (Gallery, Photo)
 
 from rest_framework.views import APIView
 
 # ... existing code ...
-class CitizenCharterViewSet(viewsets.ModelViewSet):
+class CitizenCharterViewSet(SparseFieldsetMixin, ConditionalResponseMixin, viewsets.ModelViewSet):
     queryset = CitizenCharter.objects.all()
     serializer_class = CitizenCharterSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cursor_ordering = 'pk'
+    stamp_models = (CitizenCharter,)
+    cached_actions = ('list', 'retrieve')
 
 
-class RepresentativeViewSet(viewsets.ModelViewSet):
+class RepresentativeViewSet(SparseFieldsetMixin, ConditionalResponseMixin, viewsets.ModelViewSet):
     queryset = Representative.objects.filter(is_active=True).order_by('order', 'full_name')
     serializer_class = RepresentativeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cursor_ordering = ('order', 'full_name')
+    stamp_models = (Representative,)
+    cached_actions = ('list', 'retrieve')
+
+
+def device_events(request, device_id):
+    """
+    Server-Sent Events stream telling one player which topics changed.
+    Answers 204 when push is disabled, which stops EventSource from
+    reconnecting and leaves the player on interval polling.
+    """
+    get_object_or_404(Device, pk=device_id)
+    if not settings.PLAYER_EVENTS_ENABLED:
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(device_event_stream(device_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+    return response
+
+
+# With the action's own kwargs (AllowAny), as the router would build it
+playlist_view = DeviceViewSet.as_view({'get': 'playlist'}, **DeviceViewSet.playlist.kwargs)
+published_view = NoticeViewSet.as_view({'get': 'published'}, **NoticeViewSet.published.kwargs)
+ticker_list_view = TickerViewSet.as_view({'get': 'list', 'post': 'create'}, basename='tickermessage', detail=False)
+
+
+def device_playlist(request, device_id):
+    """
+    DeviceViewSet.playlist answered from the device's pre-rendered snapshot
+    (core/snapshots.py): a stamp lookup and a file read per poll. The
+    browsable API, and devices without a snapshot, go through the viewset.
+    """
+    if not wants_json(request):
+        return playlist_view(request, pk=device_id)
+    try:
+        snapshot = snapshots.current(device_id)
+    except Device.DoesNotExist:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    if snapshot is None:
+        return playlist_view(request, pk=device_id)
+    name, stamp = snapshot
+
+    def render():
+        try:
+            return snapshot_response(request, name)
+        except FileNotFoundError:
+            # Another worker built a newer snapshot and removed this one since
+            return playlist_view(request, pk=device_id)
+    return conditional_response(request, stamp, render, 'snapshot', timezone.now().date())
+
+
+def wants_json(request):
+    """A plain JSON read, as players send (not the browsable API, not a write)."""
+    wants_html = 'text/html' in request.headers.get('Accept', '')
+    return request.method in ('GET', 'HEAD') and request.GET.get('format', 'json') == 'json' and not wants_html
+
+
+def snapshot_response(request, name):
+    """The snapshot's body in the encoding request accepts."""
+    encoding = compression.negotiate(request.headers.get('Accept-Encoding'))
+    with open(snapshots.path(name, encoding or 'gzip'), 'rb') as f:
+        body = f.read()
+    response = HttpResponse(content_type='application/json')
+    if encoding:
+        compression.encode(response, encoding, body)
+    else:
+        response.content = gzip.decompress(body)
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def player_service_worker(request):
+    """
+    The player's service worker (offline cache). Served next to the player
+    pages because a worker only controls pages below its own path: under
+    /display/ it never sees the dashboard or /admin/.
+    """
+    response = render(request, 'player/sw.js', {'media_url': settings.MEDIA_URL},
+                      content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
 # Import Nepali date function
@@ -0,0 +1,65 @@
+"""
+gunicorn settings (`gunicorn --config gunicorn.conf.py`, as in the Dockerfile
+and docker-compose.yml; gunicorn also reads this file by itself when started
+in this directory).
+
+Workers and threads are sized from the CPUs the process may use, including
+a container's CPU quota. Every setting can be overridden from the
+environment; `python manage.py benchmark_gunicorn` measures req/s at
+different worker and thread counts.
+"""
+import math
+import os
+
+
+def cpu_count():
+    """CPUs available to this process: its affinity mask, capped by a cgroup v2 quota (docker --cpus)."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == "max":
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+CPUS = cpu_count()
+
+# A process per core plus one, so a core never idles while a worker waits
+# on a slow client. Each worker also keeps its own content cache and
+# database pool (DATABASE_POOL_MAX_SIZE should be at least GUNICORN_THREADS).
+workers = int(os.environ.get("GUNICORN_WORKERS", CPUS + 1))
+# Threads per worker for requests that wait on the database or disk.
+# With more than one, gunicorn uses its threaded (gthread) worker.
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Import Django once in the master. Workers fork with the code already
+# loaded: faster restarts and pages of memory shared between workers.
+# Code changes then need a restart rather than a HUP.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+
+# Replace each worker after about this many requests, so slow leaks never
+# build up. The jitter keeps workers from restarting all at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Seconds an idle keep-alive connection is kept (threaded worker only);
+# players poll every minute, so this only saves reconnects within a burst
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Worker heartbeat files on tmpfs: on Docker's overlay filesystem they can
+# block a worker long enough for the master to kill it
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def post_fork(server, worker):
+    # Nothing should connect during preloading, but a connection made in the
+    # master must never be shared by the forked workers
+    from django.db import connections
+    connections.close_all()
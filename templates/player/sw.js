@@ -0,0 +1,238 @@
+// Service worker for the player (templates/player/display.html): keeps screens
+// playing through WAN outages and stops reloads from re-downloading media.
+//
+// - Playlist and list API JSON: answered from cache while a background fetch
+//   revalidates it; the page is told when that brought different content.
+// - Media: cache first. Content-hashed names (cas/, renditions/) never change;
+//   other uploads are revalidated in the background.
+// - After each playlist load the page posts the precache manifest URL; listed
+//   media is fetched ahead, and least recently used files are evicted to stay
+//   within the manifest's byte budget.
+
+const MEDIA_PREFIX = '{{ media_url|escapejs }}';
+const IMMUTABLE_MEDIA = [MEDIA_PREFIX + 'cas/', MEDIA_PREFIX + 'renditions/'];
+const API_PATHS = /^\/api\/v1\/(devices\/\d+\/playlist\/|notices\/published\/|charters\/|galleries\/|representatives\/|ticker\/)/;
+const API_CACHE = 'player-api';
+const MEDIA_CACHE = 'player-media';
+const META_CACHE = 'player-meta';
+const INDEX_KEY = '/player-sw/media-index.json';
+const DEFAULT_BUDGET = 512 * 1024 * 1024;
+
+self.addEventListener('install', () => self.skipWaiting());
+self.addEventListener('activate', event => event.waitUntil(self.clients.claim()));
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+    if (url.pathname.startsWith(MEDIA_PREFIX)) {
+        event.respondWith(serveMedia(event));
+    } else if (API_PATHS.test(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event));
+    }
+});
+
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'precache') {
+        event.waitUntil(precache(event.data.manifest));
+    }
+});
+
+// --- API ---
+
+async function staleWhileRevalidate(event) {
+    const cache = await caches.open(API_CACHE);
+    const cached = await cache.match(event.request);
+    const network = fetch(event.request).then(async response => {
+        if (response.ok) {
+            await cache.put(event.request, response.clone());
+            if (cached && cached.headers.get('ETag') !== response.headers.get('ETag')) {
+                notify({ type: 'updated', url: event.request.url });
+            }
+        }
+        return response;
+    });
+    if (!cached) return network;
+    event.waitUntil(network.catch(() => {}));  // offline: the cached copy is all there is
+    return cached;
+}
+
+async function notify(message) {
+    for (const client of await self.clients.matchAll({ type: 'window' })) {
+        client.postMessage(message);
+    }
+}
+
+// --- Media ---
+
+function isImmutable(url) {
+    const path = new URL(url).pathname;
+    return IMMUTABLE_MEDIA.some(prefix => path.startsWith(prefix));
+}
+
+async function serveMedia(event) {
+    const request = event.request;
+    const cache = await caches.open(MEDIA_CACHE);
+    // Keyed by URL alone so <video> range requests find the full file
+    const cached = await cache.match(request.url, { ignoreVary: true });
+    if (cached) {
+        touch(request.url);
+        if (!isImmutable(request.url)) {
+            event.waitUntil(fetch(request.url).then(response => store(request.url, response)).catch(() => {}));
+        }
+        const range = request.headers.get('Range');
+        return range ? slice(cached, range) : cached;
+    }
+    if (request.headers.has('Range')) {
+        // Let the video stream from the network; precache() fetches the whole file
+        return fetch(request);
+    }
+    const response = await fetch(request);
+    if (response.status === 200) {
+        event.waitUntil(store(request.url, response.clone()).catch(() => {}));
+    }
+    return response;
+}
+
+// A 206 for a single "bytes=" range of a cached response
+async function slice(response, header) {
+    const blob = await response.blob();
+    const match = /^bytes=(\d*)-(\d*)$/.exec(header.trim());
+    if (!match || (!match[1] && !match[2])) {
+        return new Response(blob, { status: 200, headers: response.headers });
+    }
+    let start, end;
+    if (match[1]) {
+        start = Number(match[1]);
+        end = match[2] ? Math.min(Number(match[2]), blob.size - 1) : blob.size - 1;
+    } else {
+        start = Math.max(blob.size - Number(match[2]), 0);
+        end = blob.size - 1;
+    }
+    if (start >= blob.size || end < start) {
+        return new Response(null, { status: 416, headers: { 'Content-Range': `bytes */${blob.size}` } });
+    }
+    const headers = new Headers(response.headers);
+    headers.set('Content-Range', `bytes ${start}-${end}/${blob.size}`);
+    headers.set('Content-Length', String(end - start + 1));
+    return new Response(blob.slice(start, end + 1), { status: 206, headers });
+}
+
+// --- LRU index ---
+// { budget, entries: { url: { size, used } } }, persisted in META_CACHE.
+// Mutations run one at a time so concurrent stores cannot overshoot the budget.
+
+let indexPromise = null;
+let queue = Promise.resolve();
+let saveTimer = null;
+
+function serial(task) {
+    const run = queue.then(task, task);
+    queue = run.catch(() => {});
+    return run;
+}
+
+function loadIndex() {
+    if (!indexPromise) {
+        indexPromise = (async () => {
+            const saved = await (await caches.open(META_CACHE)).match(INDEX_KEY);
+            if (saved) return saved.json();
+            // Lost or first run: rebuild from what the media cache holds
+            const index = { budget: DEFAULT_BUDGET, entries: {} };
+            const cache = await caches.open(MEDIA_CACHE);
+            for (const request of await cache.keys()) {
+                const response = await cache.match(request);
+                index.entries[request.url] = { size: Number(response.headers.get('Content-Length')) || 0, used: 0 };
+            }
+            return index;
+        })();
+    }
+    return indexPromise;
+}
+
+async function saveIndex() {
+    const index = await loadIndex();
+    const meta = await caches.open(META_CACHE);
+    await meta.put(INDEX_KEY, new Response(JSON.stringify(index), { headers: { 'Content-Type': 'application/json' } }));
+}
+
+function saveSoon() {
+    clearTimeout(saveTimer);
+    saveTimer = setTimeout(() => serial(saveIndex), 5000);
+}
+
+function touch(url) {
+    loadIndex().then(index => {
+        if (index.entries[url]) {
+            index.entries[url].used = Date.now();
+            saveSoon();
+        }
+    });
+}
+
+async function budget(index) {
+    let limit = index.budget || DEFAULT_BUDGET;
+    if (self.navigator.storage && self.navigator.storage.estimate) {
+        const { quota } = await self.navigator.storage.estimate();
+        if (quota) limit = Math.min(limit, quota * 0.8);
+    }
+    return limit;
+}
+
+function store(url, response) {
+    return serial(async () => {
+        if (!response.ok) return false;
+        const index = await loadIndex();
+        const size = Number(response.headers.get('Content-Length')) || (await response.clone().blob()).size;
+        const limit = await budget(index);
+        if (size > limit) return false;
+
+        const cache = await caches.open(MEDIA_CACHE);
+        const previous = index.entries[url];
+        let total = Object.values(index.entries).reduce((sum, entry) => sum + entry.size, 0) - (previous ? previous.size : 0);
+        const byAge = Object.entries(index.entries).filter(([key]) => key !== url).sort((a, b) => a[1].used - b[1].used);
+        for (const [key, entry] of byAge) {
+            if (total + size <= limit) break;
+            await cache.delete(key);
+            delete index.entries[key];
+            total -= entry.size;
+        }
+        await cache.put(url, response);
+        index.entries[url] = { size, used: Date.now() };
+        await saveIndex();
+        return true;
+    });
+}
+
+// --- Precache ---
+
+let precaching = null;
+
+function precache(manifestUrl) {
+    // One run at a time; a newer manifest simply waits for the current one
+    precaching = (precaching || Promise.resolve()).then(() => runPrecache(manifestUrl)).catch(error => {
+        console.warn('[SW] Precache stopped:', error);
+    });
+    return precaching;
+}
+
+async function runPrecache(manifestUrl) {
+    const response = await fetch(manifestUrl);
+    if (!response.ok) return;
+    const manifest = await response.json();
+    const index = await loadIndex();
+    index.budget = manifest.budget;
+    // Files on the current playlist count as just used, so older ones go first
+    const now = Date.now();
+    const missing = [];
+    for (const entry of manifest.entries) {
+        if (index.entries[entry.url]) index.entries[entry.url].used = now;
+        else missing.push(entry);
+    }
+    saveSoon();
+    for (const entry of missing) {
+        // One at a time, to leave bandwidth for what is on screen
+        await store(entry.url, await fetch(entry.url));
+    }
+}